@@ -0,0 +1,80 @@
+import json
+import platform
+from typing import Optional
+
+
+def _read_json(path: Optional[str]) -> Optional[dict]:
+    if path is None:
+        return None
+    with open(path, "r") as f_in:
+        return json.load(f_in)
+
+
+def main():
+    import argparse
+    from clickup_to_ical import __version__
+    from clickup_to_ical.benchmark import crawl, decode, description, hotpaths, memory, render, serve, shared, stores, \
+        subtasks
+
+    parser = argparse.ArgumentParser(description="Benchmarks for the hot paths of clickup_to_ical. Runs offline.")
+    parser.add_argument("benchmarks", nargs="*",
+                        help="Benchmarks to run (hotpaths, crawl, decode, description, render, stores, subtasks, "
+                             "memory, serve, shared), defaults to all")
+    parser.add_argument("--sizes", type=str, default="10000,100000", help="Comma separated number of events")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of n runs is reported")
+    parser.add_argument("--tasks", type=str, default="1000,10000", help="Comma separated number of tasks")
+    parser.add_argument("--snapshot", type=str, default="100000", help="Comma separated number of tasks in memory")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent clients of the load test")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds every server is under load")
+    parser.add_argument("--readers", type=str, default="1,4,16,64", help="Comma separated number of reader threads")
+    parser.add_argument("--teams", type=int, default=1, help="Number of teams of the synthetic workspace")
+    parser.add_argument("--lists", type=int, default=20, help="Number of lists of the synthetic workspace")
+    parser.add_argument("--date-fields", type=int, default=2, help="Number of custom date fields per task")
+    parser.add_argument("--depth", type=int, default=3, help="Depth of the synthetic subtask chains")
+    parser.add_argument("--description", type=int, default=500, help="Characters of markdown per task description")
+    parser.add_argument("--pages", type=int, default=20, help="Number of task pages of the decode benchmark")
+    parser.add_argument("--crawl-workers", type=str, default="1,4", help="Comma separated number of crawl workers")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Seconds every request to the fake api takes")
+    parser.add_argument("--api-rate-limit", type=int, default=None,
+                        help="Requests per minute the fake api answers before responding with 429")
+    parser.add_argument("--api-errors", type=float, default=0.0, help="Share of requests the fake api fails with 5xx")
+    parser.add_argument("--api-empty-lists", type=int, default=0, help="Number of lists without tasks in the fake api")
+    parser.add_argument("--crawl-scope", type=str, default=None,
+                        help="Scope file the crawl is also measured with, like the one of SCOPE_FILE")
+    parser.add_argument("--output", type=str, default=None, help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    benchmarks = {
+        "hotpaths": lambda: hotpaths.run(sizes=[int(x) for x in args.tasks.split(",")], teams=args.teams,
+                                         lists=args.lists, date_fields=args.date_fields, depth=args.depth,
+                                         description=args.description, repeat=args.repeat),
+        "crawl": lambda: crawl.run(lists=args.lists, tasks=int(args.tasks.split(",")[0]),
+                                   workers=[int(x) for x in args.crawl_workers.split(",")], latency=args.api_latency,
+                                   server_rate_limit=args.api_rate_limit, errors=args.api_errors,
+                                   empty_lists=args.api_empty_lists, scope=_read_json(args.crawl_scope)),
+        "decode": lambda: decode.run(pages=args.pages, description=max(args.description, 5000), repeat=args.repeat),
+        "description": lambda: description.run(repeat=args.repeat),
+        "render": lambda: render.run(sizes=[int(x) for x in args.sizes.split(",")], repeat=args.repeat),
+        "stores": lambda: stores.run(readers=[int(x) for x in args.readers.split(",")]),
+        "subtasks": lambda: subtasks.run(sizes=[int(x) for x in args.tasks.split(",")]),
+        "memory": lambda: memory.run(sizes=[int(x) for x in args.snapshot.split(",")]),
+        "serve": lambda: serve.run(clients=args.clients, duration=args.duration),
+        "shared": lambda: shared.run(tasks=int(args.snapshot.split(",")[0])),
+    }
+    selected = args.benchmarks if len(args.benchmarks) > 0 else list(benchmarks.keys())
+    unknown = [x for x in selected if x not in benchmarks]
+    if len(unknown) > 0:
+        parser.error(f"Unknown benchmarks {', '.join(unknown)}")
+
+    results = {x: benchmarks[x]() for x in selected}
+    # Everything needed to tell apart results of different versions and machines when comparing them
+    results["meta"] = {"version": __version__, "python": platform.python_version(), "machine": platform.machine(),
+                       "arguments": vars(args)}
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        with open(args.output, "w") as f_out:
+            json.dump(results, f_out, indent=2)
+
+
+if __name__ == '__main__':
+    main()
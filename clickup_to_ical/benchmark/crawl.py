@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+from clickup_to_ical.benchmark.fake_api import FakeClickup
+
+# Runs in its own process, so the client reads CLICKUP_API_URL and the rate limit on import like in production
+_CRAWL = """
+import json, time
+from clickup_to_ical.clickup import Scope, get_all, get_api_stats
+scope = Scope.from_json(json.loads({scope!r}))
+t1 = time.perf_counter()
+teams, lists, tasks = get_all(with_subtasks=True, with_closed={closed}, workers={workers}, scope=scope)
+t2 = time.perf_counter()
+calls, api_time = get_api_stats()
+print(json.dumps({{"seconds": t2 - t1, "lists": len(lists), "tasks": len(tasks), "api_calls": calls,
+                  "api_seconds": api_time}}))
+"""
+
+
+def _crawl(url: str, workers: int, rate_limit: int, scope: Optional[dict] = None, closed: bool = True) -> dict:
+    process = subprocess.run(
+        [sys.executable, "-c", _CRAWL.format(workers=workers, scope=json.dumps(scope), closed=closed)],
+        env={**os.environ, "CLICKUP_API_URL": url, "CLICKUP_API_KEY": "benchmark",
+             "CLICKUP_RATE_LIMIT": str(rate_limit)},
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return {"error": lines[-1] if len(lines) > 0 else f"Exit code {process.returncode}"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run(lists: int = 20, tasks: int = 10000, workers: List[int] = (1, 4), latency: float = 0.05,
+        rate_limit: int = 6000, server_rate_limit: Optional[int] = None, errors: float = 0.0, empty_lists: int = 0,
+        scope: Optional[dict] = None) -> dict:
+    # A full crawl against a local stand-in of the Clickup api, the workspace and the failures are seeded so runs
+    # of different versions crawl exactly the same data. Empty lists are only skipped if closed tasks are not needed,
+    # so with empty lists a crawl of open tasks is measured as well and the scoped crawl only downloads open tasks.
+    variants = {"all": (None, True)}
+    if empty_lists > 0:
+        variants["open"] = (None, False)
+    if scope is not None:
+        variants["scoped"] = (scope, empty_lists <= 0)
+    results = {}
+    for n in workers:
+        for name, (variant_scope, closed) in variants.items():
+            api = FakeClickup(lists=lists, tasks=tasks, latency=latency, rate_limit=server_rate_limit, errors=errors,
+                              empty_lists=empty_lists)
+            server = api.serve()
+            try:
+                result = _crawl(f"http://127.0.0.1:{server.server_address[1]}/api/v2", workers=n,
+                                rate_limit=rate_limit, scope=variant_scope, closed=closed)
+            finally:
+                server.shutdown()
+                server.server_close()
+            results[n if len(variants) <= 1 else f"{n} {name}"] = {**result, "server": dict(api.stats)}
+    return results
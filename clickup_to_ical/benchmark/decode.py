@@ -0,0 +1,34 @@
+import json
+from typing import List
+
+from clickup_to_ical.benchmark.hotpaths import synthetic_workspace, _best
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Task
+from clickup_to_ical.clickup.decode import TASK_PAGE_DECODERS
+
+
+def synthetic_task_pages(pages: int = 20, description: int = 5000, date_fields: int = 4,
+                         dropdown_fields: int = 8) -> List[bytes]:
+    # Full pages of 100 tasks with long descriptions and dropdowns with a dozen options each, as Clickup sends them
+    _, lists = synthetic_workspace(lists=pages, tasks=100 * pages, date_fields=date_fields, depth=0,
+                                   description=description, dropdown_fields=dropdown_fields)
+    return [json.dumps({"tasks": x["tasks"], "last_page": False}).encode("utf-8") for x in lists]
+
+
+def run(pages: int = 20, description: int = 5000, repeat: int = 3) -> dict:
+    data = synthetic_task_pages(pages=pages, description=description)
+    team = Team(id=1, name="Team", color="#000000", avatar=None, members=[])
+    lst = cList(id=1, name="List", content="", task_count=None,
+                origin=Space(id=1, name="Space", private=False, avatar=None, team=team))
+    results = {"pages": pages, "bytes_per_page": sum(len(x) for x in data) / len(data), "backends": {}}
+    for name, decode in TASK_PAGE_DECODERS.items():
+        timings = {}
+        for step, fn in (
+                ("decode", lambda: [decode(x) for x in data]),
+                ("decode_and_parse", lambda: [Task.from_json(y, lst=lst) for x in data for y in decode(x)["tasks"]]),
+        ):
+            timings[f"{step}_ms_per_page"] = _best(fn, repeat=repeat) * 1000 / len(data)
+        results["backends"][name] = timings
+    baseline = results["backends"]["json"]["decode_and_parse_ms_per_page"]
+    for timings in results["backends"].values():
+        timings["speed_up"] = baseline / timings["decode_and_parse_ms_per_page"]
+    return results
@@ -0,0 +1,33 @@
+import random
+import re
+from typing import List
+
+from clickup_to_ical.benchmark.hotpaths import _markdown, _best
+from clickup_to_ical.description import markdown_to_text, description_text
+
+_WORD = re.compile(r"\w+")
+
+
+def run(sizes: List[int] = (500, 5000, 50000), count: int = 100, repeat: int = 3) -> dict:
+    # Descriptions from a short note to a long spec. "cached" converts descriptions that did not change, as on every
+    # render after the first one.
+    results = {}
+    for size in sizes:
+        rnd = random.Random(size)
+        texts = [_markdown(rnd, size) for _ in range(count)]
+        for x in texts:
+            description_text(x)
+        timings = {
+            "markdown_bs4": _best(lambda: [markdown_to_text(x, converter="markdown") for x in texts], repeat=repeat),
+            "fast": _best(lambda: [markdown_to_text(x, converter="fast") for x in texts], repeat=repeat),
+            "cached": _best(lambda: [description_text(x) for x in texts], repeat=repeat),
+        }
+        # Share of descriptions where both conversions keep exactly the same words
+        same = sum(_WORD.findall(markdown_to_text(x, converter="markdown")) ==
+                   _WORD.findall(markdown_to_text(x, converter="fast")) for x in texts)
+        results[size] = {
+            **{f"{x}_ms_per_description": y * 1000 / count for x, y in timings.items()},
+            "speed_up": timings["markdown_bs4"] / timings["fast"],
+            "same_words": same / count,
+        }
+    return results
@@ -0,0 +1,191 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from clickup_to_ical.benchmark.hotpaths import synthetic_workspace
+
+_PAGE_SIZE = 100
+
+
+class FakeClickup:
+    # The parts of the Clickup v2 api the crawler uses, answered from a synthetic workspace. Every team gets
+    # spaces, every space folderless lists and folders with lists, like a real workspace.
+    def __init__(self, teams: int = 1, spaces: int = 2, lists: int = 20, tasks: int = 10000, date_fields: int = 2,
+                 depth: int = 3, description: int = 500, latency: float = 0.05, rate_limit: Optional[int] = None,
+                 errors: float = 0.0, empty_lists: int = 0, seed: int = 0):
+        team_json, pages = synthetic_workspace(teams=teams, lists=lists, tasks=tasks, date_fields=date_fields,
+                                               depth=depth, description=description, seed=seed)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.errors = errors
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window: Tuple[int, int] = (0, 0)
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+
+        self.teams = team_json
+        self.spaces: Dict[str, List[dict]] = {str(x["id"]): [] for x in team_json}
+        self.folders: Dict[str, List[dict]] = {}
+        self.lists: Dict[str, List[dict]] = {}
+        self.tasks: Dict[str, List[dict]] = {}
+        self.team_tasks: Dict[str, List[dict]] = {str(x["id"]): [] for x in team_json}
+        self.task_index: Dict[str, dict] = {}
+        for i, page in enumerate(pages):
+            team_id = str(page["team"])
+            space_id = f"{team_id}{i % spaces:04d}"
+            if space_id not in self.lists:
+                self.spaces[team_id].append({"id": space_id, "name": f"Space {space_id}", "private": False,
+                                             "avatar": None})
+                self.folders[space_id] = []
+                self.lists[space_id] = []
+            # Every second list of a space lives in a folder of its own
+            origin = space_id
+            if i // spaces % 2 == 1:
+                origin = f"{space_id}{i:06d}"
+                self.folders[space_id].append({"id": origin, "name": f"Folder {origin}"})
+                self.lists[origin] = []
+            list_id = str(page["list"])
+            self.lists[origin].append({"id": list_id, "name": f"List {list_id}", "content": "",
+                                       "task_count": len(page["tasks"])})
+            self.tasks[list_id] = [{**x, "list": {"id": list_id}} for x in page["tasks"]]
+            self.team_tasks[team_id].extend(self.tasks[list_id])
+            self.task_index.update((x["id"], x) for x in self.tasks[list_id])
+        # Lists nobody uses anymore, common in old workspaces. They still have to be requested to find that out.
+        space_ids = [x for x in self.lists.keys() if x in self.folders]
+        for i in range(empty_lists):
+            list_id = str(len(pages) + i)
+            self.lists[space_ids[i % len(space_ids)]].append({"id": list_id, "name": f"Empty list {list_id}",
+                                                               "content": "", "task_count": 0})
+            self.tasks[list_id] = []
+
+    def _throttle(self) -> Tuple[int, Dict[str, str]]:
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.rate_limit is None:
+                return 200, {}
+            window = int(time.time() // 60)
+            count = self._window[1] + 1 if self._window[0] == window else 1
+            self._window = (window, count)
+            headers = {"X-RateLimit-Limit": str(self.rate_limit),
+                       "X-RateLimit-Remaining": str(max(0, self.rate_limit - count)),
+                       "X-RateLimit-Reset": str((window + 1) * 60)}
+            if count > self.rate_limit:
+                self.stats["rate_limited"] += 1
+                return 429, headers
+            return 200, headers
+
+    def _fail(self) -> Optional[int]:
+        with self._lock:
+            if self._random.random() < self.errors:
+                self.stats["errors"] += 1
+                return self._random.choice((500, 502, 503))
+        return None
+
+    @staticmethod
+    def _filter(tasks: List[dict], query: Dict[str, str]) -> List[dict]:
+        if query.get("subtasks", "false") != "true":
+            tasks = [x for x in tasks if x["parent"] is None]
+        if query.get("include_closed", "false") != "true":
+            tasks = [x for x in tasks if x["status"]["type"] != "closed"]
+        if "date_updated_gt" in query:
+            tasks = [x for x in tasks if int(x["date_updated"]) > int(query["date_updated_gt"])]
+        return tasks
+
+    @staticmethod
+    def _page(tasks: List[dict], query: Dict[str, str]) -> dict:
+        page = int(query.get("page", 0))
+        chunk = tasks[page * _PAGE_SIZE:(page + 1) * _PAGE_SIZE]
+        return {"tasks": chunk, "last_page": (page + 1) * _PAGE_SIZE >= len(tasks)}
+
+    def answer(self, path: str, query: Dict[str, str]) -> Tuple[int, dict]:
+        parts = path.strip("/").split("/")
+        if parts[:2] != ["api", "v2"]:
+            return 404, {"err": "Route not found", "ECODE": "APP_001"}
+        parts = parts[2:]
+        if parts == ["team"]:
+            return 200, {"teams": self.teams}
+        if len(parts) == 3 and parts[0] == "team" and parts[2] == "space" and parts[1] in self.spaces:
+            return 200, {"spaces": self.spaces[parts[1]]}
+        if len(parts) == 3 and parts[0] == "space" and parts[2] == "folder" and parts[1] in self.folders:
+            return 200, {"folders": self.folders[parts[1]]}
+        if len(parts) == 3 and parts[0] in ("space", "folder") and parts[2] == "list" and parts[1] in self.lists:
+            return 200, {"lists": self.lists[parts[1]]}
+        if len(parts) == 3 and parts[0] == "list" and parts[2] == "task" and parts[1] in self.tasks:
+            return 200, self._page(self._filter(self.tasks[parts[1]], query), query)
+        if len(parts) == 3 and parts[0] == "team" and parts[2] == "task" and parts[1] in self.team_tasks:
+            return 200, self._page(self._filter(self.team_tasks[parts[1]], query), query)
+        if len(parts) == 2 and parts[0] == "task" and parts[1] in self.task_index:
+            return 200, self.task_index[parts[1]]
+        return 404, {"err": "Not found", "ECODE": "ITEM_015"}
+
+    def handler(self) -> type:
+        api = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(api.latency)
+                url = urlsplit(self.path)
+                status, headers = api._throttle()
+                if not self.headers.get("Authorization", ""):
+                    status, body = 401, {"err": "Token invalid", "ECODE": "OAUTH_025"}
+                elif status == 429:
+                    body = {"err": "Rate limit reached", "ECODE": "APP_002"}
+                else:
+                    status = api._fail() or status
+                    if status != 200:
+                        body = {"err": "Internal server error", "ECODE": "APP_500"}
+                    else:
+                        status, body = api.answer(url.path, {x: y[-1] for x, y in parse_qs(url.query).items()})
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        # Serves in a background thread, the api is reachable at http://host:port/api/v2
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Local stand-in of the Clickup api serving a synthetic workspace")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--teams", type=int, default=1)
+    parser.add_argument("--lists", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every request takes")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests per minute before answering 429")
+    parser.add_argument("--errors", type=float, default=0.0, help="Share of requests failing with a 5xx status")
+    parser.add_argument("--empty-lists", type=int, default=0, help="Number of additional lists without tasks")
+    args = parser.parse_args()
+    api = FakeClickup(teams=args.teams, lists=args.lists, tasks=args.tasks, latency=args.latency,
+                      rate_limit=args.rate_limit, errors=args.errors, empty_lists=args.empty_lists)
+    server = api.serve(host=args.host, port=args.port)
+    print(f"Serving the Clickup api at http://{args.host}:{server.server_address[1]}/api/v2")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
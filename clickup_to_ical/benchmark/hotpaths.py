@@ -0,0 +1,152 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+from clickup_to_ical.benchmark.memory import _user, _custom_field_definitions
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Task, index_tasks
+from clickup_to_ical.description import markdown_to_text
+from clickup_to_ical.ical import Calendar, Event, User
+from clickup_to_ical.index import build_indexes
+
+_WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do", "eiusmod",
+          "tempor", "incididunt", "ut", "labore", "et", "dolore", "magna", "aliqua"]
+
+
+def _markdown(rnd: random.Random, size: int) -> str:
+    # Headings, lists, links and emphasis like in real task descriptions, cut to roughly size characters
+    parts, length = [], 0
+    while length < size:
+        words = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(4, 16)))
+        kind = rnd.randrange(5)
+        if kind == 0:
+            part = f"## {words.capitalize()}"
+        elif kind == 1:
+            part = "\n".join(f"* {x} **{rnd.choice(_WORDS)}**" for x in words.split()[:4])
+        elif kind == 2:
+            part = f"{words} [link](https://example.com/{rnd.randrange(1000)}) `{rnd.choice(_WORDS)}`"
+        else:
+            part = f"{words.capitalize()}. _{rnd.choice(_WORDS)}_ {words}."
+        parts.append(part)
+        length += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def synthetic_workspace(teams: int = 1, lists: int = 20, tasks: int = 10000, date_fields: int = 2, depth: int = 3,
+                        description: int = 500, dropdown_fields: int = 0, members: int = 30,
+                        seed: int = 0) -> Tuple[List[dict], List[dict]]:
+    # ClickUp api json of a whole workspace. Every list gets one task page, subtasks form chains of depth levels
+    # that are spread over all lists, so most parents live in a different list than their children.
+    rnd = random.Random(seed)
+    team_json = [{"id": t, "name": f"Team {t}", "color": "#000000", "avatar": None,
+                  "members": [{"user": _user(t * members + i)} for i in range(members)]} for t in range(teams)]
+    definitions = [{"id": f"cf-{i:04d}-{'0' * 27}", "name": f"Date {i}", "type": "date", "type_config": {},
+                    "date_created": "1600000000000", "hide_from_guests": False, "required": False}
+                   for i in range(date_fields)]
+    definitions.extend(x for x in _custom_field_definitions(2 * dropdown_fields) if x["type"] == "drop_down")
+    statuses = [{"id": f"st-{x}", "status": x, "color": "#d3d3d3", "orderindex": i, "type": t}
+                for i, (x, t) in enumerate([("to do", "open"), ("in progress", "custom"), ("complete", "closed")])]
+    pages = [{"team": i % teams, "list": i, "tasks": []} for i in range(lists)]
+    for i in range(tasks):
+        team = i % lists % teams
+        level = i % (depth + 1)
+        pages[i % lists]["tasks"].append({
+            "id": f"{i:09x}", "custom_id": None, "name": f"Synthetic task number {i}", "text_content": "",
+            "description": "", "markdown_description": _markdown(rnd, description) if description > 0 else None,
+            "status": statuses[rnd.randrange(len(statuses))],
+            "orderindex": f"{i}.00000000000000000000000000000000", "date_created": str(1600000000000 + i),
+            "date_updated": str(1690000000000 + i), "date_closed": None, "archived": False,
+            "creator": _user(team * members + rnd.randrange(members)),
+            "assignees": [_user(team * members + rnd.randrange(members)) for _ in range(rnd.randint(0, 2))],
+            "watchers": [], "checklists": [], "tags": [],
+            "parent": f"{i - 1:09x}" if level > 0 else None,
+            "priority": {"id": str(rnd.randint(1, 4)), "priority": "normal", "color": "#6fddff", "orderindex": "3"},
+            "due_date": str(1700000000000 + rnd.randint(0, 10 ** 10)) if rnd.random() < 0.8 else None,
+            "start_date": str(1700000000000 + rnd.randint(0, 10 ** 10)) if rnd.random() < 0.3 else None,
+            "time_estimate": None,
+            "custom_fields": [
+                {**x, "value": str(1700000000000 + rnd.randint(0, 10 ** 10)) if x["type"] == "date" else
+                 rnd.randint(0, 11)} if rnd.random() < 0.5 else dict(x)
+                for x in definitions
+            ],
+            "url": f"https://app.clickup.com/t/{i:09x}",
+        })
+    return team_json, pages
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t1 = perf_counter()
+        fn()
+        t2 = perf_counter()
+        best = t2 - t1 if best is None else min(best, t2 - t1)
+    return best
+
+
+def _parse(team_json: List[dict], pages: List[dict]) -> List[Task]:
+    teams = [Team.from_json(x) for x in team_json]
+    spaces = [Space(id=x.id, name="Space", private=False, avatar=None, team=x) for x in teams]
+    lists = [cList(id=x["list"], name=f"List {x['list']}", content="", task_count=None, origin=spaces[x["team"]])
+             for x in pages]
+    return [Task.from_json(x, lst=lst) for lst, page in zip(lists, pages) for x in page["tasks"]]
+
+
+def _events(tasks: List[Task], descriptions: Dict[str, str]) -> List[Event]:
+    events = []
+    for task in tasks:
+        members = task.get_member_index()
+        organizer = members.get(task.creator, None)
+        attendees = [User(uri=f"mailto:{x.email}", name=x.username) for x in task.get_assignees()]
+        for dt_name, dt in task.get_all_dates().items():
+            events.append(Event(
+                uid=str(uuid.uuid3(uuid.NAMESPACE_X500, f"{task.id}-{dt_name}")),
+                dtstamp=datetime.fromtimestamp(float(task.date_created) / 1000, tz=timezone.utc),
+                url=task.url,
+                summary=f"{task.get_name()} - {dt_name.lstrip('_')}",
+                dtstart=dt,
+                dtend=dt + timedelta(hours=1),
+                priority=task.priority,
+                organizer=None if organizer is None else User(uri=f"mailto:{organizer.email}",
+                                                              name=organizer.username),
+                attendees=attendees,
+                description=descriptions.get(task.id, None),
+            ))
+    return events
+
+
+def run(sizes: List[int] = (10000,), teams: int = 1, lists: int = 20, date_fields: int = 2, depth: int = 3,
+        description: int = 500, repeat: int = 3) -> dict:
+    results = {}
+    for n in sizes:
+        team_json, pages = synthetic_workspace(teams=teams, lists=lists, tasks=n, date_fields=date_fields,
+                                               depth=depth, description=description)
+        tasks = _parse(team_json, pages)
+        index_tasks(tasks)
+        described = [x for x in tasks if x.markdown_description]
+        descriptions = {x.id: markdown_to_text(x.markdown_description) for x in described}
+        events = _events(tasks, descriptions=descriptions)
+        calendar = Calendar(version="2.0", prodid="-//CLICKUP-TO-ICAL-CONVERTER//benchmark//",
+                            calendar_name="Benchmark", events=events)
+
+        seconds = {
+            "from_json": _best(lambda: _parse(team_json, pages), repeat=repeat),
+            "get_all_dates": _best(lambda: [x.get_all_dates() for x in tasks], repeat=repeat),
+            "parent_resolution": _best(lambda: index_tasks(tasks), repeat=repeat),
+            "grouping": _best(lambda: build_indexes(tasks), repeat=repeat),
+            "markdown": _best(lambda: [markdown_to_text(x.markdown_description) for x in described], repeat=repeat),
+            "event_str": _best(lambda: [str(x) for x in events], repeat=repeat),
+            "calendar_str": _best(lambda: str(calendar), repeat=repeat),
+        }
+        counts = {
+            "from_json": len(tasks), "get_all_dates": len(tasks), "parent_resolution": len(tasks),
+            "grouping": len(tasks), "markdown": len(described), "event_str": len(events), "calendar_str": len(events),
+        }
+        results[n] = {
+            "tasks": len(tasks),
+            "events": len(events),
+            "seconds": seconds,
+            "microseconds_per_item": {x: 10 ** 6 * y / max(1, counts[x]) for x, y in seconds.items()},
+        }
+    return results
@@ -0,0 +1,153 @@
+import gc
+import json
+import random
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional, List, Any, Union, Callable
+
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Task
+
+
+@dataclass(frozen=True)
+class _LegacyCustomField:
+    id: str
+    name: str
+    type: str
+    type_config: dict
+    value: Optional[Any]
+
+
+@dataclass
+class _LegacyTask:
+    # The task model as it was before the compact representation, kept as reference
+    id: str
+    name: str
+    date_created: Optional[int]
+    date_updated: Optional[int]
+    due_date: Optional[int]
+    start_date: Optional[int]
+    custom_fields: List[_LegacyCustomField]
+    markdown_description: Optional[str]
+    lst: cList
+    assignees: List[int]
+    creator: Optional[int]
+    priority: int
+    url: str
+    parent: Union[None, str, "_LegacyTask"]
+    status: dict
+
+    @classmethod
+    def from_json(cls, json_data: dict, lst: cList) -> "_LegacyTask":
+        def _to_int(value):
+            return None if value is None else int(value)
+
+        return cls(
+            id=json_data["id"],
+            name=json_data["name"],
+            date_created=_to_int(json_data["date_created"]),
+            date_updated=_to_int(json_data["date_updated"]),
+            due_date=_to_int(json_data["due_date"]),
+            start_date=_to_int(json_data["start_date"]),
+            custom_fields=[
+                _LegacyCustomField(id=x["id"], name=x["name"], type=x["type"], type_config=x["type_config"],
+                                   value=x.get("value", None))
+                for x in json_data["custom_fields"]
+            ],
+            markdown_description=json_data["markdown_description"],
+            lst=lst,
+            assignees=[int(x["id"]) for x in json_data["assignees"]],
+            creator=json_data.get("creator", {}).get("id", None),
+            priority=json_data["priority"].get("id", None) if json_data["priority"] is not None else None,
+            url=json_data["url"],
+            parent=json_data.get("parent", None),
+            status=json_data.get("status", {})
+        )
+
+
+def _user(i: int) -> dict:
+    return {"id": 1000 + i, "username": f"User {i}", "email": f"user{i}@example.com", "color": "#7b68ee",
+            "initials": f"U{i}", "profilePicture": None}
+
+
+def _custom_field_definitions(fields: int) -> List[dict]:
+    definitions = []
+    for i in range(fields):
+        if i % 2 == 0:
+            definitions.append({"id": f"cf-{i:04d}-{'0' * 27}", "name": f"Date {i}", "type": "date",
+                                "type_config": {}, "date_created": "1600000000000", "hide_from_guests": False,
+                                "required": False})
+        else:
+            options = [{"id": f"opt-{i}-{j:02d}-{'0' * 24}", "name": f"Option {j}", "color": "#04a9f4",
+                        "orderindex": j} for j in range(12)]
+            definitions.append({"id": f"cf-{i:04d}-{'0' * 27}", "name": f"Dropdown {i}", "type": "drop_down",
+                                "type_config": {"default": 0, "placeholder": None, "options": options},
+                                "date_created": "1600000000000", "hide_from_guests": False, "required": False})
+    return definitions
+
+
+def synthetic_pages(n: int, page_size: int = 100, fields: int = 6, members: int = 30, seed: int = 0) -> List[str]:
+    # Task pages as the ClickUp api returns them, every page is decoded on its own like during a sync
+    rnd = random.Random(seed)
+    definitions = _custom_field_definitions(fields)
+    statuses = [{"id": f"st-{x}", "status": x, "color": "#d3d3d3", "orderindex": i, "type": t}
+                for i, (x, t) in enumerate([("to do", "open"), ("in progress", "custom"), ("review", "custom"),
+                                            ("complete", "closed")])]
+    pages = []
+    for start in range(0, n, page_size):
+        page = []
+        for i in range(start, min(n, start + page_size)):
+            custom_fields = []
+            for definition in definitions:
+                if definition["type"] == "date":
+                    value = str(1700000000000 + rnd.randint(0, 10 ** 10))
+                else:
+                    value = rnd.randint(0, 11)
+                custom_fields.append({**definition, "value": value} if rnd.random() < 0.7 else dict(definition))
+            page.append({
+                "id": f"{i:09x}", "custom_id": None, "name": f"Synthetic task number {i}", "text_content": "",
+                "description": "", "markdown_description": None,
+                "status": statuses[rnd.randrange(len(statuses))],
+                "orderindex": f"{i}.00000000000000000000000000000000", "date_created": str(1600000000000 + i),
+                "date_updated": str(1690000000000 + i), "date_closed": None, "archived": False,
+                "creator": _user(rnd.randrange(members)),
+                "assignees": [_user(rnd.randrange(members)) for _ in range(rnd.randint(0, 2))],
+                "watchers": [], "checklists": [], "tags": [],
+                "parent": f"{i - 1:09x}" if i % 5 else None,
+                "priority": {"id": str(rnd.randint(1, 4)), "priority": "normal", "color": "#6fddff",
+                             "orderindex": "3"},
+                "due_date": str(1700000000000 + rnd.randint(0, 10 ** 10)), "start_date": None,
+                "time_estimate": None, "custom_fields": custom_fields,
+                "url": f"https://app.clickup.com/t/{i:09x}",
+            })
+        pages.append(json.dumps({"tasks": page}))
+    return pages
+
+
+def _measure(pages: List[str], task_cls: Callable, lists: List[cList]) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    tasks = []
+    for i, page in enumerate(pages):
+        lst = lists[i % len(lists)]
+        tasks.extend(task_cls.from_json(x, lst=lst) for x in json.loads(page)["tasks"])
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": current, "peak_bytes": peak, "bytes_per_task": current / max(1, len(tasks))}
+
+
+def run(sizes: List[int] = (100000,)) -> dict:
+    team = Team(id=1, name="Team", color="#000000", avatar=None, members=[])
+    space = Space(id=1, name="Space", private=False, avatar=None, team=team)
+    lists = [cList(id=i, name=f"List {i}", content="", task_count=None, origin=space) for i in range(50)]
+    results = {}
+    for n in sizes:
+        pages = synthetic_pages(n)
+        legacy = _measure(pages, _LegacyTask, lists=lists)
+        compact = _measure(pages, Task, lists=lists)
+        results[n] = {
+            "legacy": legacy,
+            "compact": compact,
+            "reduction": 1 - compact["bytes"] / legacy["bytes"],
+        }
+    return results
@@ -0,0 +1,125 @@
+import random
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import List
+
+import pytz
+
+from clickup_to_ical.ical import Calendar, Event, User
+
+
+def _legacy_escape_nl(text) -> str:
+    return str(text).replace("\n", "\\n")
+
+
+def _legacy_datetime_to_str(dt_name: str, dt: datetime) -> str:
+    base = f"{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}"
+    if dt.tzinfo is None:
+        return f"{dt_name}:{base}"
+    elif dt.tzinfo in (pytz.UTC, timezone.utc, pytz.timezone("UTC")):
+        return f"{dt_name}:{base}Z"
+    else:
+        return f"{dt_name};TZID={dt.tzinfo};VALUE=DATE:{base}"
+
+
+def _legacy_event_str(event: Event) -> str:
+    ret = [
+        f"UID:{event.uid}",
+        _legacy_datetime_to_str("DTSTAMP", event.dtstamp),
+        _legacy_datetime_to_str("DTSTART", event.dtstart)
+    ]
+    if event.dtend is not None:
+        ret.append(_legacy_datetime_to_str("DTEND", event.dtend))
+    if event.url is not None:
+        ret.append(f"URL:{event.url}")
+    if event.summary is not None:
+        ret.append(f"SUMMARY:{_legacy_escape_nl(event.summary)}")
+    if event.description is not None:
+        ret.append(f"DESCRIPTION:{_legacy_escape_nl(event.description)}")
+    if event.priority is not None:
+        ret.append(f"PRIORITY:{_legacy_escape_nl(event.priority)}")
+    if event.organizer is not None:
+        ret.append(_legacy_escape_nl(f"ORGANIZER;CN={event.organizer.name}:{event.organizer.uri}"))
+    ret.extend(_legacy_escape_nl(f"ATTENDEE;CN={x.name}:{x.uri}") for x in event.attendees)
+    return "BEGIN:VEVENT\n{}\nEND:VEVENT".format("\n".join(ret))
+
+
+def legacy_calendar_str(calendar: Calendar) -> str:
+    # The writer as it was before the single pass escaping and octet based folding, kept as reference
+    ret = [
+        f"VERSION:{_legacy_escape_nl(calendar.version)}",
+        f"PRODID:{_legacy_escape_nl(calendar.prodid)}",
+    ]
+    if calendar.calendar_name is not None:
+        ret.append(f"X-WR-CALNAME:{_legacy_escape_nl(calendar.calendar_name)}")
+    ret.extend(_legacy_event_str(event) for event in calendar.events)
+    cal_text = "BEGIN:VCALENDAR\n{}\nEND:VCALENDAR".format('\n'.join(ret))
+    ret = []
+    for line in cal_text.splitlines():
+        while len(line.strip()) > 0:
+            ret.append(line[:75])
+            line = " " + line[75:]
+    return "\r\n".join(ret)
+
+
+def synthetic_events(count: int, seed: int = 0, unicode: bool = False) -> List[Event]:
+    rnd = random.Random(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do"]
+    if unicode:
+        words.extend(["größe", "überprüfen", "日本語", "emoji🎉", "naïve"])
+    users = [User(uri=f"mailto:user{i}@example.com", name=f"User {i}") for i in range(25)]
+    start = datetime(2023, 1, 1, tzinfo=pytz.UTC)
+    events = []
+    for i in range(count):
+        dt = start + timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+        events.append(Event(
+            uid=f"{i:08d}-0000-0000-0000-000000000000",
+            dtstamp=start,
+            dtstart=dt,
+            dtend=dt + timedelta(hours=1),
+            url=f"https://app.clickup.com/t/{i:08x}",
+            summary=" ".join(rnd.choice(words) for _ in range(rnd.randint(2, 12))) + " - Due Date",
+            description="\n".join(
+                " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 30))) for _ in range(rnd.randint(0, 6))
+            ) or None,
+            priority=rnd.randint(1, 4),
+            organizer=rnd.choice(users),
+            attendees=rnd.sample(users, rnd.randint(0, 3)),
+        ))
+    return events
+
+
+def _calendar(events: List[Event]) -> Calendar:
+    return Calendar(version="2.0", prodid="-//CLICKUP-TO-ICAL-CONVERTER//benchmark//", calendar_name="Benchmark",
+                    events=events)
+
+
+def check_golden() -> bool:
+    # Plain ascii text without characters that need escaping has to render exactly like the reference writer
+    calendar = _calendar(synthetic_events(500, seed=1))
+    if str(calendar) != legacy_calendar_str(calendar):
+        return False
+    # Folded lines may never be longer than 75 octets or split a utf-8 sequence
+    text = str(_calendar(synthetic_events(500, seed=1, unicode=True)))
+    return all(len(x.encode("utf-8")) <= 75 for x in text.split("\r\n"))
+
+
+def run(sizes: List[int] = (10000, 100000), repeat: int = 3) -> dict:
+    results = {"golden": check_golden(), "sizes": {}}
+    for size in sizes:
+        calendar = _calendar(synthetic_events(size))
+        timings = {}
+        # Joining events that are already rendered, as done for tasks with cached events
+        fragments = _calendar([x.to_ical() for x in calendar.events])
+        for name, fn in (("legacy", legacy_calendar_str), ("writer", str), ("fragments", lambda _: str(fragments))):
+            best = None
+            for _ in range(repeat):
+                t1 = perf_counter()
+                fn(calendar)
+                t2 = perf_counter()
+                best = t2 - t1 if best is None else min(best, t2 - t1)
+            timings[name] = best
+        timings["speed_up"] = timings["legacy"] / timings["writer"]
+        timings["speed_up_fragments"] = timings["legacy"] / timings["fragments"]
+        results["sizes"][size] = timings
+    return results
@@ -0,0 +1,105 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from clickup_to_ical.benchmark.memory import synthetic_pages, _user
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Task, index_tasks
+from clickup_to_ical.clickup.snapshot import save_snapshot
+
+_TOKEN = "benchmark"
+
+
+def _write_snapshot(directory: str, n: int, members: int = 30) -> str:
+    team = Team.from_json({"id": 1, "name": "Team", "color": "#000000", "avatar": None,
+                           "members": [{"user": _user(i)} for i in range(members)]})
+    space = Space(id=1, name="Space", private=False, avatar=None, team=team)
+    lists = [cList(id=i, name=f"List {i}", content="", task_count=None, origin=space) for i in range(50)]
+    tasks = []
+    for i, page in enumerate(synthetic_pages(n, members=members)):
+        tasks.extend(Task.from_json(x, lst=lists[i % len(lists)]) for x in json.loads(page)["tasks"])
+    index_tasks(tasks)
+    path = os.path.join(directory, "snapshot.json.gz")
+    save_snapshot(path, teams=[team], lists=lists, tasks=tasks)
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, path: str, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            connection.request("GET", path)
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server on port {port} did not get ready")
+
+
+def _client(port: int, path: str, duration: float) -> List[float]:
+    latencies = []
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t1 = time.perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - t1)
+        if response.getheader("Connection", "").lower() == "close" or response.version < 11:
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    return latencies
+
+
+def _load(mode: str, env: dict, clients: int, duration: float, path: str) -> dict:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-c", "from clickup_to_ical.host import main; main()"],
+        env={**env, "WEB_SERVER": mode, "FLASK_PORT": str(port)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(port, path)
+        with ProcessPoolExecutor(max_workers=clients) as pool:
+            jobs = [pool.submit(_client, port, path, duration) for _ in range(clients)]
+            latencies = sorted(x for job in jobs for x in job.result())
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "requests_per_second": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if len(latencies) > 0 else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if len(latencies) > 0 else None,
+    }
+
+
+def run(tasks: int = 10000, clients: int = 16, duration: float = 10, workers: int = None, threads: int = 8) -> dict:
+    # Both servers read the same synthetic snapshot, so neither of them talks to the Clickup API
+    with tempfile.TemporaryDirectory() as directory:
+        auth_file = os.path.join(directory, "auth.json")
+        with open(auth_file, "w") as f_out:
+            json.dump({_TOKEN: 1000}, f_out)
+        env = {
+            **os.environ, "CLICKUP_API_KEY": "benchmark", "TASK_SOURCE": "snapshot", "AUTH_FILE": auth_file,
+            "SNAPSHOT_FILE": _write_snapshot(directory, n=tasks),
+            "WEB_WORKERS": str(workers or os.cpu_count() or 1), "WEB_THREADS": str(threads),
+        }
+        path = f"/api/1.0/calendar?token={_TOKEN}&fixed_uid=true"
+        results = {x: _load(x, env=env, clients=clients, duration=duration, path=path) for x in ("flask", "gunicorn")}
+    results["speed_up"] = results["gunicorn"]["requests_per_second"] / results["flask"]["requests_per_second"]
+    return results
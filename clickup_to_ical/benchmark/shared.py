@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+from clickup_to_ical.benchmark.memory import synthetic_pages, _user
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Task, index_tasks
+from clickup_to_ical.clickup.snapshot import save_snapshot
+from clickup_to_ical.index import build_indexes
+from clickup_to_ical.shared import save_shared_snapshot
+
+# Runs in a fresh process like a worker would, loads the tasks and touches every record once
+_WORKER = """
+import json
+from clickup_to_ical.web import stores
+index = stores.tenants[stores.DEFAULT_TENANT].tasks.get(None)
+events = 0 if index is None else sum(1 for _ in index.records(date_types=None, include_closed=True))
+memory = {}
+with open("/proc/self/smaps_rollup") as f_in:
+    for line in f_in:
+        parts = line.split()
+        if parts[0] in ("Rss:", "Private_Clean:", "Private_Dirty:", "Shared_Clean:", "Shared_Dirty:"):
+            memory[parts[0][:-1].lower()] = int(parts[1]) * 1024
+print(json.dumps({"events": events, **memory}))
+"""
+
+
+def _write_files(directory: str, n: int, members: int = 30):
+    team = Team.from_json({"id": 1, "name": "Team", "color": "#000000", "avatar": None,
+                           "members": [{"user": _user(i)} for i in range(members)]})
+    space = Space(id=1, name="Space", private=False, avatar=None, team=team)
+    lists = [cList(id=i, name=f"List {i}", content="", task_count=None, origin=space) for i in range(50)]
+    tasks: List[Task] = []
+    for i, page in enumerate(synthetic_pages(n, members=members)):
+        tasks.extend(Task.from_json(x, lst=lists[i % len(lists)]) for x in json.loads(page)["tasks"])
+    index_tasks(tasks)
+    snapshot_file = os.path.join(directory, "snapshot.json.gz")
+    shared_file = os.path.join(directory, "shared.bin")
+    save_snapshot(snapshot_file, teams=[team], lists=lists, tasks=tasks)
+    save_shared_snapshot(shared_file, teams=[team], lists=lists, tasks=tasks, indexes=build_indexes(tasks))
+    return snapshot_file, shared_file
+
+
+def _worker(env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", _WORKER], env=env, check=True, capture_output=True).stdout
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def run(tasks: int = 100000) -> dict:
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return {"error": "Needs /proc/self/smaps_rollup (linux)"}
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_file, shared_file = _write_files(directory, n=tasks)
+        env = {**os.environ, "SNAPSHOT_FILE": snapshot_file, "SHARED_SNAPSHOT_FILE": shared_file,
+               "SNAPSHOT_POLL_RATE": "3600"}
+        results = {
+            "empty": _worker({**env, "TASK_SOURCE": "snapshot", "SNAPSHOT_FILE": os.path.join(directory, "missing")}),
+            "snapshot": _worker({**env, "TASK_SOURCE": "snapshot"}),
+            "shared": _worker({**env, "TASK_SOURCE": "shared"}),
+            "shared_file_bytes": os.path.getsize(shared_file),
+        }
+    # Private dirty memory is what every additional worker costs. Pages of the mapped file are clean and shared
+    # between all workers, they only count as private while a single process maps the file.
+    base = results["empty"]["private_dirty"]
+    results["private_dirty_reduction"] = 1 - (
+        (results["shared"]["private_dirty"] - base) / (results["snapshot"]["private_dirty"] - base)
+    )
+    return results
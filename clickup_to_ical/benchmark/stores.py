@@ -0,0 +1,103 @@
+import threading
+import time
+from logging import getLogger
+from time import perf_counter, sleep
+from typing import Callable, List, Tuple
+
+from clickup_to_ical.utils import SnapshotDict
+
+_LOGGER = getLogger("clickup_to_ical")
+
+
+# The store of the tasks before SnapshotDict, every read takes the lock
+class ThreadingDict:
+    def __init__(self, auto_update: Tuple[Callable[[], dict], int] = None):
+        self._lock = threading.Lock()
+        self._data = {}
+        if auto_update is not None:
+            fn = auto_update[0]
+            freq = auto_update[1]
+            self._freq = freq
+
+            def _tmp():
+                while True:
+                    try:
+                        _v = fn()
+                        if _v is not None:
+                            self.set(_v)
+                    except Exception as e:
+                        _LOGGER.exception("Failed to update", e)
+                    time.sleep(freq)
+
+            threading.Thread(target=_tmp, daemon=True).start()
+        else:
+            self._freq = None
+
+    @property
+    def frequency(self) -> int:
+        return self._freq
+
+    def set(self, data: dict):
+        with self._lock:
+            self._data.clear()
+            self._data.update(data)
+
+    def __getitem__(self, k):
+        r = self.get(k, None)
+        if r is None:
+            raise KeyError(f"Key {k} not found in dictionary")
+        return r
+
+    def get(self, k, default=None):
+        with self._lock:
+            return self._data.get(k, default)
+
+
+def _contention(store_cls, readers: int, reads: int, keys: int) -> float:
+    data = {k: tuple(range(10)) for k in range(keys)}
+    store = store_cls()
+    store.set(data)
+    done = threading.Event()
+    start = threading.Barrier(readers + 1)
+
+    def _read():
+        start.wait()
+        get = store.get
+        for i in range(reads):
+            get(i % keys, None)
+
+    def _write():
+        # Publish a new snapshot every few milliseconds, like a webhook heavy workload would. ThreadingDict only
+        # knows set, so both stores get all tasks again with one of them changed.
+        version = 0
+        while not done.is_set():
+            version += 1
+            store.set({**data, 0: (version,)})
+            sleep(0.005)
+
+    threads = [threading.Thread(target=_read) for _ in range(readers)]
+    writer = threading.Thread(target=_write)
+    for t in threads:
+        t.start()
+    writer.start()
+    start.wait()
+    t1 = perf_counter()
+    for t in threads:
+        t.join()
+    t2 = perf_counter()
+    done.set()
+    writer.join()
+    return readers * reads / (t2 - t1)
+
+
+def run(readers: List[int] = (1, 4, 16, 64), reads: int = 100000, keys: int = 500) -> dict:
+    results = {}
+    for n in readers:
+        threading_dict = _contention(ThreadingDict, readers=n, reads=reads, keys=keys)
+        snapshot_dict = _contention(SnapshotDict, readers=n, reads=reads, keys=keys)
+        results[n] = {
+            "threading_dict_reads_per_second": threading_dict,
+            "snapshot_dict_reads_per_second": snapshot_dict,
+            "speed_up": snapshot_dict / threading_dict,
+        }
+    return results
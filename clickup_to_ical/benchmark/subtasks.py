@@ -0,0 +1,78 @@
+import os
+from time import perf_counter
+from typing import Dict, List
+
+from clickup_to_ical.clickup.data import Team, Space, List as cList, Status, Task, index_tasks
+
+
+def synthetic_tasks(n: int, lists: int = 20, fan_out: int = 4) -> List[Task]:
+    # A wide and deep subtask tree, children are spread over all lists so many parents live in a different list
+    team = Team(id=1, name="Team", color="#000000", avatar=None, members=[])
+    space = Space(id=1, name="Space", private=False, avatar=None, team=team)
+    lsts = [cList(id=i, name=f"List {i}", content="", task_count=None, origin=space) for i in range(lists)]
+    status = Status.from_json({})
+    tasks = []
+    for i in range(n):
+        tasks.append(Task(
+            id=f"t{i}", name=f"Task {i}", date_created=None, date_updated=None, due_date=None, start_date=None,
+            custom_fields=(), markdown_description=None, lst=lsts[i % lists], assignees=(1,), creator=None,
+            priority=None, url="", parent=f"t{(i - 1) // fan_out}" if i > 0 else None, status=status,
+        ))
+    return tasks
+
+
+def _legacy_get_name(task: Task) -> str:
+    if task.parent is None:
+        return task.name
+    return (f"{_legacy_get_name(task.parent) if isinstance(task.parent, Task) else task.parent} "
+            f"{os.environ.get('SUBTASK_CONNECTION_SYMBOL', '📥')} "
+            f"{task.name}")
+
+
+def _legacy(tasks: List[Task], names: int) -> float:
+    by_list: Dict[int, List[Task]] = {}
+    for t in tasks:
+        by_list.setdefault(t.lst.id, []).append(t)
+    t1 = perf_counter()
+    # The old per list resolution, every task scans the whole list for its parent
+    for lst_tasks in by_list.values():
+        for t in lst_tasks:
+            t.update(other_tasks=lst_tasks)
+    for _ in range(names):
+        for t in tasks:
+            _legacy_get_name(t)
+    return perf_counter() - t1
+
+
+def _indexed(tasks: List[Task], names: int) -> float:
+    t1 = perf_counter()
+    index_tasks(tasks)
+    for _ in range(names):
+        for t in tasks:
+            t.get_name()
+    return perf_counter() - t1
+
+
+def _depth(task: Task) -> int:
+    depth = 0
+    while isinstance(task.parent, Task):
+        task, depth = task.parent, depth + 1
+    return depth
+
+
+def run(sizes: List[int] = (1000, 10000), names: int = 3, lists: int = 20, fan_out: int = 4) -> dict:
+    results = {}
+    for n in sizes:
+        legacy_tasks = synthetic_tasks(n, lists=lists, fan_out=fan_out)
+        legacy = _legacy(legacy_tasks, names=names)
+        tasks = synthetic_tasks(n, lists=lists, fan_out=fan_out)
+        indexed = _indexed(tasks, names=names)
+        results[n] = {
+            "legacy_seconds": legacy,
+            "indexed_seconds": indexed,
+            "speed_up": legacy / indexed,
+            "max_depth": max(_depth(x) for x in tasks),
+            "legacy_unresolved_parents": sum(1 for x in legacy_tasks if isinstance(x.parent, str)),
+            "unresolved_parents": sum(1 for x in tasks if isinstance(x.parent, str)),
+        }
+    return results
@@ -1,84 +1,397 @@
 import logging
 import os
-from typing import List as tList, Union
+import random
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List as tList, Union, Optional, Tuple, Dict, Iterable, Iterator, Set
 
-from requests import Response
+from requests import Response, RequestException, ConnectionError as RequestConnectionError, Timeout
+from requests.adapters import HTTPAdapter
 from requests_ratelimiter import LimiterSession
 
-from .data import Member, Team, Space, List, Folder, Task
+from clickup_to_ical.metrics import API_REQUESTS, API_DURATION, API_RATE_LIMIT_WAIT, API_RETRIES
+from .decode import DECODE_ERRORS, loads, decode_task_page, decode_task
+from .data import Member, Team, Space, List, Folder, CustomField, Status, Task, index_tasks
+from .scope import Scope
 
-_SESSION = LimiterSession(per_minute=int(os.environ.get("CLICKUP_RATE_LIMIT", 50)))
+_LOGGER = logging.getLogger("clickup_to_ical")
 
-try:
-    os.environ["CLICKUP_API_KEY"]
-except KeyError:
-    logging.exception("CLICKUP_API_KEY not set. Please set CLICKUP_API_KEY in environment variables.")
-    exit(1)
+# Can point to a stand-in of the Clickup API, for example the one of the crawl benchmark
+_API_URL = os.environ.get("CLICKUP_API_URL", "https://api.clickup.com/api/v2").rstrip("/")
+_RATE_LIMIT_PER_MINUTE = int(os.environ.get("CLICKUP_RATE_LIMIT", 50))
+_WORKERS = max(1, int(os.environ.get("CLICKUP_WORKERS", 4)))
+_RETRIES = max(0, int(os.environ.get("CLICKUP_RETRIES", 5)))
+_BACKOFF = float(os.environ.get("CLICKUP_BACKOFF", 1))
+_BACKOFF_MAX = 60.0
+_TIMEOUT = float(os.environ.get("CLICKUP_TIMEOUT", 30))
+_RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
 
 
-def _get_url(url: str, params=None) -> Response:
-    return _SESSION.get(url, headers={"Authorization": os.environ["CLICKUP_API_KEY"]}, params=params)
+class _RateLimit:
+    # The local limiter only knows the configured budget. Clickup tells in every response how much of its budget
+    # is left, once it is used up or Clickup asks to retry later all requests pause until the window resets.
+    def __init__(self, reserve: int):
+        self._reserve = reserve
+        self._lock = threading.Lock()
+        self._until = 0.0
 
+    def wait(self) -> float:
+        with self._lock:
+            delay = self._until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return max(0.0, delay)
 
-def get_teams() -> tList[Team]:
-    response = _get_url("https://api.clickup.com/api/v2/team")
-    return [Team.from_json(x) for x in response.json()["teams"]]
+    def update(self, response: Response):
+        now = time.time()
+        until = None
+        retry_after = response.headers.get("Retry-After", None)
+        remaining = response.headers.get("X-RateLimit-Remaining", None)
+        reset = response.headers.get("X-RateLimit-Reset", None)
+        try:
+            if retry_after is not None:
+                until = now + float(retry_after)
+            elif reset is not None and (response.status_code == 429 or
+                                        (remaining is not None and int(remaining) <= self._reserve)):
+                until = float(reset)
+            elif response.status_code == 429:
+                until = now + _BACKOFF_MAX
+        except ValueError:
+            _LOGGER.debug(f"Ignoring malformed rate limit headers of {response.url}")
+        if until is not None:
+            # A clock far off from the one of Clickup never pauses the crawl for longer than one window
+            until = min(until, now + _BACKOFF_MAX)
+            with self._lock:
+                self._until = max(self._until, until)
 
 
-def get_spaces(team: Team) -> tList[Space]:
-    response = _get_url(f"https://api.clickup.com/api/v2/team/{team.id}/space", params={"archived": "false"})
-    return [Space.from_json(x, team=team) for x in response.json()["spaces"]]
+class _TimedLimiter:
+    # Wraps the limiter of a LimiterSession, so the time requests wait for their slot in the bucket is measured where
+    # it is spent instead of guessed from the duration of the whole request
+    def __init__(self, limiter):
+        self._limiter = limiter
 
+    def try_acquire(self, *args, **kwargs):
+        t1 = time.perf_counter()
+        try:
+            return self._limiter.try_acquire(*args, **kwargs)
+        finally:
+            API_RATE_LIMIT_WAIT.inc(time.perf_counter() - t1)
 
-def get_folders(space: Space) -> tList[Folder]:
-    response = _get_url(f"https://api.clickup.com/api/v2/space/{space.id}/folder", params={"archived": "false"})
-    return [Folder.from_json(x, space=space) for x in response.json()["folders"]]
+    def __getattr__(self, name):
+        return getattr(self._limiter, name)
 
 
-def get_lists(origin: Union[Folder, Space]) -> tList[List]:
+class Client:
+    # Everything bound to one Clickup API key: the session with its rate budget, the rate limit Clickup reports for
+    # the key and the api stats. Without an api key CLICKUP_API_KEY is used.
+    def __init__(self, api_key: Optional[str] = None, rate_limit: Optional[int] = None, workers: Optional[int] = None,
+                 name: str = "default"):
+        self.name = name
+        self.workers = _WORKERS if workers is None else max(1, workers)
+        self._api_key = api_key
+        self.session = LimiterSession(per_minute=_RATE_LIMIT_PER_MINUTE if rate_limit is None else rate_limit)
+        self.session.limiter = _TimedLimiter(self.session.limiter)
+        # Crawl workers and their page prefetches run in two pools, so up to twice the workers keep a connection alive
+        for prefix in ("https://", "http://"):
+            self.session.mount(prefix, HTTPAdapter(pool_connections=4, pool_maxsize=2 * self.workers))
+        # Requests already on their way when the budget runs out still have to fit into it
+        self.rate_limit = _RateLimit(reserve=2 * self.workers)
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._api_time = 0.0
+
+    @property
+    def api_key(self) -> str:
+        return self._api_key if self._api_key is not None else os.environ["CLICKUP_API_KEY"]
+
+    def add_call(self, elapsed: float):
+        with self._stats_lock:
+            self._calls += 1
+            self._api_time += elapsed
+
+    def stats(self) -> Tuple[int, float]:
+        with self._stats_lock:
+            return self._calls, self._api_time
+
+
+_CLIENT = Client()
+
+
+def require_api_key():
+    try:
+        os.environ["CLICKUP_API_KEY"]
+    except KeyError:
+        logging.exception("CLICKUP_API_KEY not set. Please set CLICKUP_API_KEY in environment variables.")
+        exit(1)
+
+
+def _endpoint(url: str) -> str:
+    # /list/123/task -> /list/{id}/task, so the metrics do not get one series per list or task
+    parts = url[len(_API_URL):].strip("/").split("/")
+    return "/" + "/".join("{id}" if i % 2 == 1 else x for i, x in enumerate(parts))
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter, so workers failing at the same time do not retry at the same time again
+    return random.uniform(0, min(_BACKOFF_MAX, _BACKOFF * 2 ** attempt))
+
+
+def _get_url(url: str, params=None, client: Optional[Client] = None) -> Response:
+    # Only used for GET requests, so every failed or throttled request can safely be sent again
+    client = _CLIENT if client is None else client
+    endpoint = _endpoint(url)
+    attempt = 0
+    while True:
+        API_RATE_LIMIT_WAIT.inc(client.rate_limit.wait())
+        try:
+            response = client.session.get(url, headers={"Authorization": client.api_key}, params=params,
+                                          timeout=_TIMEOUT)
+        except (RequestConnectionError, Timeout) as e:
+            API_REQUESTS.inc(endpoint=endpoint, status=type(e).__name__)
+            if attempt >= _RETRIES:
+                raise
+            reason = type(e).__name__
+        else:
+            # elapsed only covers the http round trip, the wait for the rate limiter is counted by _TimedLimiter
+            elapsed = response.elapsed.total_seconds()
+            client.add_call(elapsed)
+            API_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+            API_DURATION.observe(elapsed, endpoint=endpoint)
+            client.rate_limit.update(response)
+            if response.status_code not in _RETRY_STATUS or attempt >= _RETRIES:
+                return response
+            reason = str(response.status_code)
+        API_RETRIES.inc(endpoint=endpoint, reason=reason)
+        delay = _backoff(attempt)
+        attempt += 1
+        _LOGGER.debug(f"Retrying {endpoint} for {client.name} in {delay:.2f}s after {reason} "
+                      f"(attempt {attempt} of {_RETRIES})")
+        time.sleep(delay)
+
+
+def _get_json(url: str, params=None, decode=loads, client: Optional[Client] = None) -> dict:
+    response = _get_url(url, params=params, client=client)
+    response.raise_for_status()
+    return decode(response.content)
+
+
+def get_api_stats(client: Optional[Client] = None) -> Tuple[int, float]:
+    return (_CLIENT if client is None else client).stats()
+
+
+def get_teams(client: Optional[Client] = None) -> tList[Team]:
+    return [Team.from_json(x) for x in _get_json(f"{_API_URL}/team", client=client)["teams"]]
+
+
+def get_spaces(team: Team, client: Optional[Client] = None) -> tList[Space]:
+    d = _get_json(f"{_API_URL}/team/{team.id}/space", params={"archived": "false"}, client=client)
+    return [Space.from_json(x, team=team) for x in d["spaces"]]
+
+
+def get_folders(space: Space, client: Optional[Client] = None) -> tList[Folder]:
+    d = _get_json(f"{_API_URL}/space/{space.id}/folder", params={"archived": "false"}, client=client)
+    return [Folder.from_json(x, space=space) for x in d["folders"]]
+
+
+def get_lists(origin: Union[Folder, Space], client: Optional[Client] = None) -> tList[List]:
     if isinstance(origin, Folder):
-        response = _get_url(f"https://api.clickup.com/api/v2/folder/{origin.id}/list", params={"archived": "false"})
+        d = _get_json(f"{_API_URL}/folder/{origin.id}/list", params={"archived": "false"}, client=client)
     elif isinstance(origin, Space):
-        response = _get_url(f"https://api.clickup.com/api/v2/space/{origin.id}/list", params={"archived": "false"})
+        d = _get_json(f"{_API_URL}/space/{origin.id}/list", params={"archived": "false"}, client=client)
     else:
         raise TypeError(f"Unsupported origin type {type(origin)}")
-    return [List.from_json(x, origin=origin) for x in response.json()["lists"]]
+    return [List.from_json(x, origin=origin) for x in d["lists"]]
 
 
-def get_tasks(lst: List, with_subtasks: bool = False, with_closed: bool = False) -> tList[Task]:
+def _get_tasks_page(lst: List, page: int, with_subtasks: bool, with_closed: bool,
+                    client: Optional[Client] = None) -> dict:
+    params = {
+        "archived": "false",
+        "include_markdown_description": "true",
+        "page": page,
+    }
+    if with_subtasks:
+        params["subtasks"] = "true"
+    if with_closed:
+        params["include_closed"] = "true"
+    try:
+        return _get_json(f"{_API_URL}/list/{lst.id}/task", params=params, decode=decode_task_page, client=client)
+    except DECODE_ERRORS as e:
+        _LOGGER.error(f"Failed to decode page {page} of the tasks of {lst} ({lst.id}): {e}")
+        raise
+
+
+def get_tasks(lst: List, with_subtasks: bool = False, with_closed: bool = False,
+              executor: Optional[Executor] = None, client: Optional[Client] = None) -> tList[Task]:
+    tasks: tList[Task] = []
+    page: int = 0
+    d = _get_tasks_page(lst=lst, page=page, with_subtasks=with_subtasks, with_closed=with_closed, client=client)
+    while True:
+        next_page = None
+        if not d["last_page"] and executor is not None:
+            next_page = executor.submit(_get_tasks_page, lst, page + 1, with_subtasks, with_closed, client)
+        tasks.extend([Task.from_json(x, lst=lst) for x in d["tasks"]])
+        if d["last_page"]:
+            break
+        page += 1
+        if next_page is None:
+            d = _get_tasks_page(lst=lst, page=page, with_subtasks=with_subtasks, with_closed=with_closed,
+                                client=client)
+        else:
+            d = next_page.result()
+    index_tasks(tasks)
+    return tasks
+
+
+def get_task(task_id: str, lists: Dict[str, List], client: Optional[Client] = None) -> Optional[Task]:
+    response = _get_url(f"{_API_URL}/task/{task_id}", params={"include_markdown_description": "true"}, client=client)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    d = decode_task(response.content)
+    lst = lists.get(d.get("list", {}).get("id", None), None)
+    if lst is None:
+        _LOGGER.debug(f"Skipping task {task_id} from unknown list")
+        return None
+    return Task.from_json(d, lst=lst)
+
+
+def get_team_tasks(team: Team, lists: Dict[str, List], date_updated_gt: Optional[int] = None,
+                   with_subtasks: bool = False, with_closed: bool = False, space_ids: Optional[Iterable] = None,
+                   client: Optional[Client] = None) -> tList[Task]:
     tasks: tList[Task] = []
     page: int = 0
     while True:
         params = {
-            "archived": "false",
             "include_markdown_description": "true",
             "page": page,
         }
+        if date_updated_gt is not None:
+            params["date_updated_gt"] = date_updated_gt
         if with_subtasks:
             params["subtasks"] = "true"
         if with_closed:
             params["include_closed"] = "true"
-        response = _get_url(f"https://api.clickup.com/api/v2/list/{lst.id}/task", params=params)
-        d = response.json()
-        tasks.extend([Task.from_json(x, lst=lst) for x in d["tasks"]])
-        if d["last_page"]:
+        if space_ids is not None:
+            params["space_ids[]"] = list(space_ids)
+        d = _get_json(f"{_API_URL}/team/{team.id}/task", params=params, decode=decode_task_page, client=client)
+        for x in d["tasks"]:
+            lst = lists.get(x.get("list", {}).get("id", None), None)
+            if lst is None:
+                _LOGGER.debug(f"Skipping task {x['id']} from unknown list")
+                continue
+            tasks.append(Task.from_json(x, lst=lst))
+        if d.get("last_page", False) or len(d["tasks"]) <= 0:
             break
         page += 1
-    for t in tasks:
-        t.update(other_tasks=tasks)
     return tasks
 
 
-def get_tasks_all(with_subtasks: bool = False, with_closed: bool = False) -> tList[Task]:
+def _collect_tasks(lst: List, download, failed: Optional[tList[List]]) -> tList[Task]:
+    # A page Clickup answered with malformed or unexpected json only fails its list, like a failed request
+    try:
+        return download()
+    except (RequestException, *DECODE_ERRORS):
+        if failed is None:
+            raise
+        _LOGGER.exception(f"Failed to download the tasks of {lst}")
+        failed.append(lst)
+        return []
+
+
+def _is_empty(lst: List, with_closed: bool) -> bool:
+    # Closed tasks are not reliably part of the task count of a list, so only lists without any open task are
+    # skipped and only if closed tasks are not needed anyway
+    return not with_closed and lst.task_count == 0
+
+
+def _log_skipped(lists: tList[List], skipped: tList[List]):
+    if len(skipped) > 0:
+        _LOGGER.debug(f"Skipped {len(skipped)} of {len(lists)} lists without open tasks")
+
+
+def _crawl_hierarchy(scope: Scope, pool: Optional[Executor] = None,
+                     client: Optional[Client] = None) -> Tuple[tList[Team], Iterator[List]]:
+    # The lists are yielded as soon as they are known, so downloading their tasks can start while the rest of the
+    # hierarchy is still crawled. Teams, spaces and folders out of scope are never requested.
+    def _submit(fn, **kwargs):
+        if pool is None:
+            result = fn(**kwargs)
+            return lambda: result
+        return pool.submit(fn, **kwargs).result
+
+    def _lists() -> Iterator[List]:
+        space_jobs = [_submit(get_spaces, team=x, client=client) for x in teams]
+        spaces = [x for job in space_jobs for x in job() if scope.allows(x)]
+        folder_jobs = [_submit(get_folders, space=x, client=client) for x in spaces]
+        list_jobs = [_submit(get_lists, origin=x, client=client) for x in spaces]
+        for job in folder_jobs:
+            list_jobs.extend(_submit(get_lists, origin=x, client=client) for x in job() if scope.allows(x))
+        for job in list_jobs:
+            yield from (x for x in job() if scope.allows(x))
+
+    teams = [x for x in get_teams(client=client) if scope.allows(x)]
+    return teams, _lists()
+
+
+def get_all(with_subtasks: bool = False, with_closed: bool = False, workers: Optional[int] = None,
+            failed: Optional[tList[List]] = None, scope: Optional[Scope] = None,
+            hierarchy: Optional[Tuple[tList[Team], tList[List]]] = None, keep_lists: Optional[Set] = None,
+            client: Optional[Client] = None) -> Tuple[tList[Team], tList[List], tList[Task]]:
+    # With a failed list given, lists whose tasks could not be downloaded are added to it instead of failing the
+    # whole crawl. The hierarchy itself always has to be complete. A hierarchy given is used instead of crawling it
+    # again, lists in keep_lists are downloaded even if their possibly outdated task count is zero.
     from itertools import chain
-    teams = get_teams()
-    spaces = list(chain(*[get_spaces(team=x) for x in teams]))
-    folders = list(chain(*[get_folders(space=x) for x in spaces]))
-    lists = list(chain(*[get_lists(origin=x) for x in spaces + folders]))
-    return list(chain(*[get_tasks(lst=x, with_subtasks=with_subtasks, with_closed=with_closed) for x in lists]))
+    client = _CLIENT if client is None else client
+    scope = Scope() if scope is None else scope
+    workers = client.workers if workers is None else max(1, workers)
+    keep_lists = set() if keep_lists is None else keep_lists
+
+    def _skip(lst: List) -> bool:
+        return _is_empty(lst, with_closed=with_closed) and lst.id not in keep_lists
+
+    if workers <= 1:
+        teams, lists = _crawl_hierarchy(scope=scope, client=client) if hierarchy is None else hierarchy
+        lists = list(lists)
+        tasks = list(chain(*[_collect_tasks(x, lambda lst=x: get_tasks(
+            lst=lst, with_subtasks=with_subtasks, with_closed=with_closed, client=client
+        ), failed=failed) for x in lists if not _skip(x)]))
+        _log_skipped(lists, skipped=[x for x in lists if _skip(x)])
+        index_tasks(tasks)
+        return teams, lists, tasks
+
+    # Hierarchy requests and list downloads share one pool, page prefetches get their own pool so a list waiting for
+    # its next page can never block the worker that would fetch it. All requests still go through the session of
+    # the client and therefore share the same rate limit budget.
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clickup-crawl") as pool, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clickup-page") as pages:
+        teams, found = _crawl_hierarchy(scope=scope, pool=pool, client=client) if hierarchy is None else hierarchy
+        lists, skipped, task_jobs = [], [], []
+        for x in found:
+            lists.append(x)
+            if _skip(x):
+                skipped.append(x)
+                continue
+            task_jobs.append((x, pool.submit(
+                get_tasks, lst=x, with_subtasks=with_subtasks, with_closed=with_closed, executor=pages,
+                client=client,
+            )))
+        tasks = list(chain(*[_collect_tasks(x, job.result, failed=failed) for x, job in task_jobs]))
+        _log_skipped(lists, skipped=skipped)
+        index_tasks(tasks)
+        return teams, lists, tasks
+
+
+def get_tasks_all(with_subtasks: bool = False, with_closed: bool = False, workers: Optional[int] = None,
+                  scope: Optional[Scope] = None, client: Optional[Client] = None) -> tList[Task]:
+    return get_all(with_subtasks=with_subtasks, with_closed=with_closed, workers=workers, scope=scope,
+                   client=client)[2]
 
 
 __all__ = [
-    "get_teams", "get_spaces", "get_folders", "get_lists", "get_lists", "get_tasks", "get_tasks_all",
-    "Member", "Team", "Space", "List", "Folder", "Task"
+    "get_teams", "get_spaces", "get_folders", "get_lists", "get_lists", "get_tasks", "get_tasks_all", "get_task",
+    "get_team_tasks", "get_all", "get_api_stats", "Client", "Scope",
+    "require_api_key", "Member", "Team", "Space", "List", "Folder", "CustomField", "Status", "Task", "index_tasks"
 ]
@@ -1,7 +1,15 @@
 import os
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Optional, List as tList, Any, Union, Dict
+from typing import Optional, List as tList, Any, Union, Dict, Iterable, Tuple
+
+_SUBTASK_CONNECTION_SYMBOL = os.environ.get('SUBTASK_CONNECTION_SYMBOL', '📥')
+
+# Values repeated across many tasks (ids, statuses, field definitions) are shared instead of stored once per task
+_INTERNED: Dict[Any, Any] = {}
+_CUSTOM_FIELDS: Dict[str, "CustomField"] = {}
+_STATUSES: Dict[tuple, "Status"] = {}
 
 
 def _to_int(value: str) -> Optional[int]:
@@ -10,8 +18,18 @@ def _to_int(value: str) -> Optional[int]:
     return int(value)
 
 
+def _intern(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return sys.intern(value)
+    return _INTERNED.setdefault(value, value)
+
+
 @dataclass(frozen=True)
 class Member:
+    __slots__ = ("id", "username", "email", "color", "profilePicture", "initials", "role", "custom_role",
+                 "last_active", "date_joined", "date_invited")
     id: int
     username: str
     email: str
@@ -30,7 +48,7 @@ class Member:
     @classmethod
     def from_json(cls, json_data: dict) -> "Member":
         return cls(
-            id=_to_int(json_data.get("id")),
+            id=_intern(_to_int(json_data.get("id"))),
             username=json_data.get("username"),
             email=json_data.get("email"),
             color=json_data.get("color"),
@@ -50,7 +68,12 @@ class Team:
     name: str
     color: str
     avatar: Optional[str]
-    members: tList[Member]
+    members: Tuple[Member, ...]
+    member_index: Dict[int, Member] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "members", tuple(self.members))
+        object.__setattr__(self, "member_index", {x.id: x for x in self.members})
 
     def __str__(self):
         return f"{self.__class__.__name__}-{self.name} ({self.id})"
@@ -66,7 +89,10 @@ class Team:
         )
 
     def get_members(self) -> tList[Member]:
-        return self.members
+        return list(self.members)
+
+    def get_member_index(self) -> Dict[int, Member]:
+        return self.member_index
 
 
 @dataclass(frozen=True)
@@ -93,6 +119,9 @@ class Space:
     def get_members(self) -> tList[Member]:
         return self.team.get_members()
 
+    def get_member_index(self) -> Dict[int, Member]:
+        return self.team.get_member_index()
+
 
 @dataclass(frozen=True)
 class Folder:
@@ -114,6 +143,9 @@ class Folder:
     def get_members(self) -> tList[Member]:
         return self.space.get_members()
 
+    def get_member_index(self) -> Dict[int, Member]:
+        return self.space.get_member_index()
+
 
 @dataclass(frozen=True)
 class List:
@@ -139,50 +171,98 @@ class List:
     def get_members(self) -> tList[Member]:
         return self.origin.get_members()
 
+    def get_member_index(self) -> Dict[int, Member]:
+        return self.origin.get_member_index()
+
 
 @dataclass(frozen=True)
 class CustomField:
+    __slots__ = ("id", "name", "type", "type_config")
     id: str
     name: str
     type: str
     type_config: dict
-    value: Optional[Any]
 
     def __str__(self):
         return f"{self.__class__.__name__}-{self.name} ({self.id})"
 
     @classmethod
     def from_json(cls, json_data: dict) -> "CustomField":
-        return cls(
-            id=json_data["id"],
-            name=json_data["name"],
-            type=json_data["type"],
-            type_config=json_data["type_config"],
-            value=json_data.get("value", None)
+        # All tasks share one definition per field, it is only replaced if the definition itself changed
+        # Lean decoding of task pages skips the type config, nothing but the type is used to render events
+        type_config = json_data.get("type_config", {})
+        known = _CUSTOM_FIELDS.get(json_data["id"], None)
+        if known is not None and known.name == json_data["name"] and known.type == json_data["type"] and \
+                known.type_config == type_config:
+            return known
+        custom_field = cls(
+            id=_intern(json_data["id"]),
+            name=_intern(json_data["name"]),
+            type=_intern(json_data["type"]),
+            type_config=type_config,
         )
+        _CUSTOM_FIELDS[custom_field.id] = custom_field
+        return custom_field
+
+    def value_from_json(self, value: Any) -> Any:
+        if self.type == "date":
+            return _to_int(value)
+        if isinstance(value, str):
+            return _intern(value)
+        return value
+
+
+@dataclass(frozen=True)
+class Status:
+    __slots__ = ("status", "type", "color", "orderindex")
+    status: Optional[str]
+    type: str
+    color: Optional[str]
+    orderindex: Optional[int]
+
+    def __str__(self):
+        return f"{self.__class__.__name__}-{self.status} ({self.type})"
+
+    @classmethod
+    def from_json(cls, json_data: dict) -> "Status":
+        orderindex = json_data.get("orderindex", None)
+        key = (json_data.get("status", None), json_data.get("type", "open"), json_data.get("color", None),
+               _to_int(orderindex) if orderindex is not None else None)
+        status = _STATUSES.get(key, None)
+        if status is None:
+            status = _STATUSES.setdefault(key, cls(*(_intern(x) for x in key)))
+        return status
 
 
 # @dataclass(frozen=True) # TODO: Find better way to have frozen dataclass and be able to have parents as Task type
 @dataclass
 class Task:
+    __slots__ = ("id", "name", "date_created", "date_updated", "due_date", "start_date", "custom_fields",
+                 "markdown_description", "lst", "assignees", "creator", "priority", "url", "parent", "status",
+                 "_display_name")
     id: str
     name: str
     date_created: Optional[int]
     date_updated: Optional[int]
     due_date: Optional[int]
     start_date: Optional[int]
-    custom_fields: tList[CustomField]
+    # Only the value is stored per task, the definition is shared
+    custom_fields: Tuple[Tuple[CustomField, Any], ...]
     markdown_description: Optional[str]
     lst: List
-    assignees: tList[int]
+    assignees: Tuple[int, ...]
     creator: Optional[int]
-    priority: int
+    priority: Optional[str]
     url: str
     parent: Union[None, str, "Task"]
-    status: dict
+    status: Status
+
+    def __post_init__(self):
+        self._display_name: Optional[str] = None
 
     def get_assignees(self) -> tList[Member]:
-        return [x for x in self.get_members() if x.id in self.assignees]
+        members = self.get_member_index()
+        return [members[x] for x in self.assignees if x in members]
 
     def get_all_dates(self) -> Dict[str, datetime]:
         ret = {}
@@ -190,33 +270,39 @@ class Task:
             ret["Due Date"] = datetime.fromtimestamp(float(self.due_date) / 1000, tz=timezone.utc)
         if self.start_date is not None:
             ret["Start Date"] = datetime.fromtimestamp(float(self.start_date) / 1000, tz=timezone.utc)
-        for custom_field in self.custom_fields:
-            if custom_field.type == "date" and custom_field.value is not None:
-                ret[f"__{custom_field.name}"] = datetime.fromtimestamp(float(custom_field.value) / 1000,
-                                                                       tz=timezone.utc)
+        for custom_field, value in self.custom_fields:
+            if custom_field.type == "date" and value is not None:
+                ret[f"__{custom_field.name}"] = datetime.fromtimestamp(float(value) / 1000, tz=timezone.utc)
         return ret
 
     def get_members(self) -> tList[Member]:
         return self.lst.get_members()
 
+    def get_member_index(self) -> Dict[int, Member]:
+        return self.lst.get_member_index()
+
     def __str__(self):
         return f"{self.__class__.__name__}-{self.get_name()} ({self.id})"
 
     def get_name(self) -> str:
-        if self.parent is None:
-            return self.name
-        return (f"{self.parent.get_name() if isinstance(self.parent, Task) else self.parent} "
-                f"{os.environ.get('SUBTASK_CONNECTION_SYMBOL', '📥')} "
-                f"{self.name}")
+        if self._display_name is None:
+            if self.parent is None:
+                self._display_name = self.name
+            else:
+                self._display_name = (f"{self.parent.get_name() if isinstance(self.parent, Task) else self.parent} "
+                                      f"{_SUBTASK_CONNECTION_SYMBOL} "
+                                      f"{self.name}")
+        return self._display_name
 
     def update(self, other_tasks: tList["Task"]):
         if isinstance(self.parent, str):
             for t in other_tasks:
                 if t.id == self.parent:
                     self.parent = t
+                    self._display_name = None
 
     def is_open(self) -> bool:
-        return not self.status.get("type", "open").lower() == "closed"
+        return not self.status.type.lower() == "closed"
 
     @classmethod
     def from_json(cls, json_data: dict, lst: List) -> "Task":
@@ -227,13 +313,41 @@ class Task:
             date_updated=_to_int(json_data["date_updated"]),
             due_date=_to_int(json_data["due_date"]),
             start_date=_to_int(json_data["start_date"]),
-            custom_fields=[CustomField.from_json(x) for x in json_data["custom_fields"]],
+            custom_fields=tuple(_custom_field_values(json_data["custom_fields"])),
             markdown_description=json_data["markdown_description"],
             lst=lst,
-            assignees=[int(x["id"]) for x in json_data["assignees"]],
-            creator=json_data.get("creator", {}).get("id", None),
-            priority=json_data["priority"].get("id", None) if json_data["priority"] is not None else None,
+            assignees=tuple(_intern(int(x["id"])) for x in json_data["assignees"]),
+            creator=_intern(json_data.get("creator", {}).get("id", None)),
+            priority=_intern(json_data["priority"].get("id", None)) if json_data["priority"] is not None else None,
             url=json_data["url"],
             parent=json_data.get("parent", None),
-            status=json_data.get("status", {})
+            status=Status.from_json(json_data.get("status", None) or {})
         )
+
+
+def _custom_field_values(json_data: tList[dict]) -> Iterable[Tuple[CustomField, Any]]:
+    for x in json_data:
+        custom_field = CustomField.from_json(x)
+        yield custom_field, custom_field.value_from_json(x.get("value", None))
+
+
+def index_tasks(tasks: Iterable[Task]) -> Dict[str, Task]:
+    index = {x.id: x for x in tasks}
+    # Link every task to the parent object from the index, also if the parent lives in a different list.
+    # Parents that are not part of the index keep the id or the object they had before.
+    for task in index.values():
+        parent_id = task.parent.id if isinstance(task.parent, Task) else task.parent
+        if parent_id is not None:
+            task.parent = index.get(parent_id, task.parent)
+        task._display_name = None
+    # Names are built top down along the parent chain, so deep subtask trees never recurse in get_name
+    for task in index.values():
+        chain, seen = [], set()
+        current = task
+        while isinstance(current, Task) and current._display_name is None and id(current) not in seen:
+            chain.append(current)
+            seen.add(id(current))
+            current = current.parent
+        for t in reversed(chain):
+            t.get_name()
+    return index
@@ -0,0 +1,80 @@
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Task pages are the bulk of every sync. With msgspec they are decoded straight into records holding only the
+# fields Task.from_json reads, everything else (text content, watchers, checklists, the options of every custom
+# field, ...) is skipped while parsing. Without it the fastest available parser decodes the whole page.
+LOADERS: Dict[str, Callable[[Union[bytes, str]], Any]] = {"json": json.loads}
+TASK_PAGE_DECODERS: Dict[str, Callable[[Union[bytes, str]], dict]] = {"json": json.loads}
+TASK_DECODERS: Dict[str, Callable[[Union[bytes, str]], dict]] = {"json": json.loads}
+# Raised for malformed json and, with msgspec, for json that does not match the records
+DECODE_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,)
+
+if orjson is not None:
+    LOADERS["orjson"] = TASK_PAGE_DECODERS["orjson"] = TASK_DECODERS["orjson"] = orjson.loads
+    DECODE_ERRORS += (orjson.JSONDecodeError,)
+
+if msgspec is not None:
+    from typing import TypedDict
+
+    class _Ref(TypedDict, total=False):
+        id: Any
+
+    class _StatusRecord(TypedDict, total=False):
+        status: Optional[str]
+        type: str
+        color: Optional[str]
+        orderindex: Any
+
+    class _CustomFieldRecord(TypedDict, total=False):
+        id: str
+        name: str
+        type: str
+        value: Any
+
+    class _TaskRecord(TypedDict, total=False):
+        id: str
+        name: str
+        date_created: Optional[str]
+        date_updated: Optional[str]
+        due_date: Optional[str]
+        start_date: Optional[str]
+        custom_fields: List[_CustomFieldRecord]
+        markdown_description: Optional[str]
+        assignees: List[_Ref]
+        creator: _Ref
+        priority: Optional[_Ref]
+        url: str
+        parent: Optional[str]
+        status: Optional[_StatusRecord]
+        list: _Ref
+
+    class _TaskPage(TypedDict, total=False):
+        tasks: List[_TaskRecord]
+        last_page: bool
+
+    LOADERS["msgspec"] = msgspec.json.decode
+    TASK_PAGE_DECODERS["msgspec"] = msgspec.json.Decoder(_TaskPage).decode
+    TASK_DECODERS["msgspec"] = msgspec.json.Decoder(_TaskRecord).decode
+    DECODE_ERRORS += (msgspec.DecodeError, msgspec.ValidationError)
+
+BACKEND = os.environ.get("CLICKUP_JSON", "msgspec" if msgspec is not None else "orjson" if orjson else "json")
+if BACKEND not in LOADERS:
+    raise ValueError(f"CLICKUP_JSON is set to {BACKEND}, available are {', '.join(LOADERS.keys())}")
+
+loads = LOADERS[BACKEND]
+decode_task_page = TASK_PAGE_DECODERS[BACKEND]
+decode_task = TASK_DECODERS[BACKEND]
+
+__all__ = ["BACKEND", "DECODE_ERRORS", "loads", "decode_task_page", "decode_task"]
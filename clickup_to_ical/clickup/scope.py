@@ -0,0 +1,62 @@
+import json
+import os
+from fnmatch import fnmatchcase
+from typing import Dict, Optional, Sequence, Union
+
+from clickup_to_ical.clickup.data import Team, Space, Folder, List
+
+_LEVELS = {Team: "teams", Space: "spaces", Folder: "folders", List: "lists"}
+
+
+class _Rule:
+    # A pattern matches the id of an item exactly or its name as a case insensitive glob pattern
+    def __init__(self, include: Sequence[str] = (), exclude: Sequence[str] = ()):
+        self.include = tuple(str(x) for x in include)
+        self.exclude = tuple(str(x) for x in exclude)
+
+    @staticmethod
+    def _matches(patterns: Sequence[str], item: Union[Team, Space, Folder, List]) -> bool:
+        item_id, name = str(item.id), item.name.lower()
+        return any(x == item_id or fnmatchcase(name, x.lower()) for x in patterns)
+
+    def allows(self, item: Union[Team, Space, Folder, List]) -> bool:
+        if len(self.include) > 0 and not self._matches(self.include, item):
+            return False
+        return not self._matches(self.exclude, item)
+
+    def __bool__(self):
+        return len(self.include) > 0 or len(self.exclude) > 0
+
+
+class Scope:
+    # Which part of the workspace gets crawled. Every level has include and exclude patterns, an item is crawled if
+    # it matches one include pattern (or there are none) and no exclude pattern. Teams, spaces and folders left out
+    # are not even requested, folder rules do not apply to lists without a folder.
+    def __init__(self, rules: Optional[Dict[str, _Rule]] = None):
+        self._rules = {x: _Rule() for x in _LEVELS.values()}
+        self._rules.update(rules or {})
+
+    @classmethod
+    def from_json(cls, json_data: Optional[dict]) -> "Scope":
+        json_data = json_data or {}
+        unknown = [x for x in json_data.keys() if x not in _LEVELS.values()]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown scope levels {', '.join(unknown)}, available are {', '.join(_LEVELS.values())}")
+        return cls({x: _Rule(include=y.get("include", ()), exclude=y.get("exclude", ())) for x, y in json_data.items()})
+
+    @classmethod
+    def from_env(cls) -> "Scope":
+        if "SCOPE_FILE" not in os.environ:
+            return cls()
+        with open(os.environ["SCOPE_FILE"], "r") as f_in:
+            return cls.from_json(json.load(f_in))
+
+    @property
+    def restricted(self) -> bool:
+        return any(self._rules.values())
+
+    def allows(self, item: Union[Team, Space, Folder, List]) -> bool:
+        return self._rules[_LEVELS[type(item)]].allows(item)
+
+
+__all__ = ["Scope"]
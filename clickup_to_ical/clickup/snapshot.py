@@ -0,0 +1,122 @@
+import gzip
+import json
+import os
+import tempfile
+from dataclasses import asdict
+from logging import getLogger
+from typing import Dict, List as tList, Optional, Tuple
+
+from clickup_to_ical.clickup.decode import loads
+from clickup_to_ical.clickup.data import Member, Team, Space, Folder, List, CustomField, Status, Task, index_tasks
+
+_LOGGER = getLogger("clickup_to_ical")
+
+_SNAPSHOT_FORMAT = "clickup_to_ical-snapshot"
+_SNAPSHOT_VERSION = 2
+
+
+def _encode_list_origin(origin) -> dict:
+    if isinstance(origin, Folder):
+        return {"folder": origin.id}
+    return {"space": origin.id}
+
+
+def encode_task(task: Task) -> dict:
+    return {
+        "id": task.id, "name": task.name, "date_created": task.date_created, "date_updated": task.date_updated,
+        "due_date": task.due_date, "start_date": task.start_date,
+        "custom_fields": [[y.id, v] for y, v in task.custom_fields],
+        "markdown_description": task.markdown_description, "lst": task.lst.id, "assignees": task.assignees,
+        "creator": task.creator, "priority": task.priority, "url": task.url,
+        "parent": task.parent.id if isinstance(task.parent, Task) else task.parent, "status": asdict(task.status),
+    }
+
+
+def decode_task(data: dict, lists: Dict[int, List], custom_fields: Dict[str, CustomField]) -> Task:
+    return Task(**{
+        **data, "lst": lists[data["lst"]], "assignees": tuple(data["assignees"]),
+        "status": Status.from_json(data["status"]),
+        "custom_fields": tuple((custom_fields[y], v) for y, v in data["custom_fields"]),
+    })
+
+
+def encode_snapshot(teams: tList[Team], lists: tList[List], tasks: tList[Task], **meta) -> dict:
+    # Every object is written once and referenced by id, so the hierarchy is not repeated for every task
+    spaces = {x.origin.id: x.origin for x in lists if isinstance(x.origin, Space)}
+    folders = {x.origin.id: x.origin for x in lists if isinstance(x.origin, Folder)}
+    spaces.update({x.space.id: x.space for x in folders.values()})
+    custom_fields = {y.id: y for x in tasks for y, _ in x.custom_fields}
+    return {
+        "format": _SNAPSHOT_FORMAT,
+        "version": _SNAPSHOT_VERSION,
+        "meta": meta,
+        "teams": [
+            {"id": x.id, "name": x.name, "color": x.color, "avatar": x.avatar,
+             "members": [asdict(y) for y in x.members]}
+            for x in teams
+        ],
+        "spaces": [
+            {"id": x.id, "name": x.name, "private": x.private, "avatar": x.avatar, "team": x.team.id}
+            for x in spaces.values()
+        ],
+        "folders": [{"id": x.id, "name": x.name, "space": x.space.id} for x in folders.values()],
+        "lists": [
+            {"id": x.id, "name": x.name, "content": x.content, "task_count": x.task_count,
+             **_encode_list_origin(x.origin)}
+            for x in lists
+        ],
+        "custom_fields": [asdict(x) for x in custom_fields.values()],
+        "tasks": [encode_task(x) for x in tasks],
+    }
+
+
+def decode_hierarchy(data: dict) -> Tuple[tList[Team], Dict[int, List], Dict[str, CustomField]]:
+    if data.get("format", None) != _SNAPSHOT_FORMAT or data.get("version", None) != _SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot {data.get('format', None)} version {data.get('version', None)}")
+    teams = {
+        x["id"]: Team(**{**x, "members": [Member(**y) for y in x["members"]]}) for x in data["teams"]
+    }
+    spaces = {x["id"]: Space(**{**x, "team": teams[x["team"]]}) for x in data["spaces"]}
+    folders = {x["id"]: Folder(**{**x, "space": spaces[x["space"]]}) for x in data["folders"]}
+    lists = {}
+    for x in data["lists"]:
+        x = dict(x)
+        origin = folders[x.pop("folder")] if "folder" in x else spaces[x.pop("space")]
+        lists[x["id"]] = List(**x, origin=origin)
+    custom_fields = {x["id"]: CustomField.from_json(x) for x in data["custom_fields"]}
+    return list(teams.values()), lists, custom_fields
+
+
+def decode_snapshot(data: dict) -> Tuple[tList[Team], tList[List], tList[Task], dict]:
+    teams, lists, custom_fields = decode_hierarchy(data)
+    tasks = [decode_task(x, lists=lists, custom_fields=custom_fields) for x in data["tasks"]]
+    index_tasks(tasks)
+    return teams, list(lists.values()), tasks, data.get("meta", {})
+
+
+def save_snapshot(path: str, teams: tList[Team], lists: tList[List], tasks: tList[Task], **meta):
+    data = json.dumps(encode_snapshot(teams=teams, lists=lists, tasks=tasks, **meta), separators=(",", ":"))
+    directory = os.path.dirname(os.path.abspath(path))
+    # Write next to the target and swap it in afterwards, so a crash never leaves a half written snapshot behind
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f_out:
+            with gzip.GzipFile(fileobj=f_out, mode="wb", compresslevel=6, mtime=0) as gz_out:
+                gz_out.write(data.encode("utf-8"))
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path: str) -> Optional[Tuple[tList[Team], tList[List], tList[Task], dict]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rb") as f_in:
+            return decode_snapshot(loads(f_in.read()))
+    except Exception as e:
+        _LOGGER.warning(f"Failed to load snapshot from {path}: {e}")
+        return None
@@ -0,0 +1,177 @@
+import threading
+import time
+from logging import getLogger
+from typing import Dict, List as tList, Optional, Tuple
+
+from clickup_to_ical.clickup import _CLIENT, Client, get_all, get_team_tasks, get_task
+from clickup_to_ical.clickup.data import Team, Folder, List, Task, index_tasks
+from clickup_to_ical.clickup.scope import Scope
+from clickup_to_ical.clickup.snapshot import save_snapshot, load_snapshot
+
+_LOGGER = getLogger("clickup_to_ical")
+
+# Tasks updated right before the previous sync might not have been visible yet, so every delta overlaps a bit.
+# Merging by task id makes fetching a task twice harmless.
+_DELTA_OVERLAP_MS = 60 * 1000
+
+
+class TaskSync:
+    def __init__(self, with_subtasks: bool = False, with_closed: bool = False, full_sync_rate: Optional[int] = None,
+                 workers: Optional[int] = None, scope: Optional[Scope] = None, hierarchy_rate: Optional[int] = None,
+                 client: Optional[Client] = None):
+        self._client = client
+        self._scope = Scope() if scope is None else scope
+        # Without a hierarchy rate every full sync crawls teams, spaces, folders and lists again
+        self._hierarchy_rate = hierarchy_rate
+        self._hierarchy_synced: Optional[float] = None
+        self._with_subtasks = with_subtasks
+        self._with_closed = with_closed
+        self._full_sync_rate = full_sync_rate
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._teams: tList[Team] = []
+        self._lists: Dict[str, List] = {}
+        self._tasks: Dict[str, Task] = {}
+        self._date_updated: Optional[int] = None
+        self._last_full_sync: Optional[float] = None
+
+    @property
+    def client(self) -> Client:
+        # Syncs without a client of their own use the default client of CLICKUP_API_KEY
+        return _CLIENT if self._client is None else self._client
+
+    @property
+    def date_updated(self) -> Optional[int]:
+        return self._date_updated
+
+    @property
+    def teams(self) -> tList[Team]:
+        with self._lock:
+            return list(self._teams)
+
+    @property
+    def lists(self) -> tList[List]:
+        with self._lock:
+            return list(self._lists.values())
+
+    def needs_full_sync(self) -> bool:
+        if self._full_sync_rate is None or self._last_full_sync is None or self._date_updated is None:
+            return True
+        return time.time() - self._last_full_sync >= self._full_sync_rate
+
+    def sync(self) -> tList[Task]:
+        if self.needs_full_sync():
+            return self.full_sync()
+        return self.delta_sync()
+
+    def _cached_hierarchy(self) -> Optional[Tuple[tList[Team], tList[List]]]:
+        if self._hierarchy_rate is None or self._hierarchy_synced is None:
+            return None
+        if time.time() - self._hierarchy_synced >= self._hierarchy_rate:
+            return None
+        with self._lock:
+            return list(self._teams), list(self._lists.values())
+
+    def full_sync(self) -> tList[Task]:
+        failed: tList[List] = []
+        hierarchy = self._cached_hierarchy()
+        keep_lists = None
+        if hierarchy is not None:
+            # Task counts of a cached hierarchy are outdated, lists that have tasks by now are never skipped
+            with self._lock:
+                keep_lists = {x.lst.id for x in self._tasks.values()}
+        started = time.time()
+        teams, lists, tasks = get_all(
+            with_subtasks=self._with_subtasks, with_closed=self._with_closed, workers=self._workers, failed=failed,
+            scope=self._scope, hierarchy=hierarchy, keep_lists=keep_lists, client=self._client,
+        )
+        if hierarchy is None:
+            self._hierarchy_synced = started
+        if len(failed) <= 0:
+            return self._install(teams=teams, lists=lists, tasks=tasks, last_full_sync=time.time())
+        # Lists that failed keep their tasks from before and the next sync is a full one again
+        failed_ids = {x.id for x in failed}
+        with self._lock:
+            kept = [x for x in self._tasks.values() if x.lst.id in failed_ids]
+            last_full_sync = self._last_full_sync
+        _LOGGER.warning(f"Keeping {len(kept)} previous tasks of {len(failed)} lists that failed to download")
+        tasks = tasks + kept
+        index_tasks(tasks)
+        return self._install(teams=teams, lists=lists, tasks=tasks, last_full_sync=last_full_sync)
+
+    def delta_sync(self) -> tList[Task]:
+        date_updated_gt = self._date_updated - _DELTA_OVERLAP_MS
+        updated: tList[Task] = []
+        for team in self._teams:
+            space_ids = self._space_ids(team=team)
+            if space_ids is not None and len(space_ids) <= 0:
+                continue
+            # Closed tasks are always requested, otherwise a task closed since the last sync would never show up
+            # and stay open in the snapshot until the next full sync
+            updated.extend(get_team_tasks(
+                team=team, lists=self._lists, date_updated_gt=date_updated_gt,
+                with_subtasks=self._with_subtasks, with_closed=True, space_ids=space_ids,
+                client=self._client,
+            ))
+        _LOGGER.debug(f"Merging {len(updated)} tasks updated since {date_updated_gt}")
+        with self._lock:
+            for task in updated:
+                self._merge(task=task)
+            if len(updated) > 0:
+                index_tasks(self._tasks.values())
+            return list(self._tasks.values())
+
+    def _space_ids(self, team: Team) -> Optional[tList]:
+        # Tasks of lists out of scope are dropped anyway, with a scope Clickup does not even send them
+        if not self._scope.restricted:
+            return None
+        with self._lock:
+            origins = [x.origin.space if isinstance(x.origin, Folder) else x.origin for x in self._lists.values()]
+        return sorted({x.id for x in origins if x.team.id == team.id}, key=str)
+
+    def refresh_task(self, task_id: str) -> Tuple[Optional[Task], Optional[Task]]:
+        task = get_task(task_id=task_id, lists=self._lists, client=self._client)
+        with self._lock:
+            old = self._tasks.get(task_id, None)
+            if task is None or (not self._with_subtasks and task.parent is not None):
+                self._tasks.pop(task_id, None)
+                return old, None
+            new = self._merge(task=task)
+            index_tasks(self._tasks.values())
+            return old, new
+
+    def remove_task(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.pop(task_id, None)
+
+    def save(self, path: str):
+        with self._lock:
+            teams, lists, tasks = list(self._teams), list(self._lists.values()), list(self._tasks.values())
+            last_full_sync = self._last_full_sync
+        save_snapshot(path=path, teams=teams, lists=lists, tasks=tasks, last_full_sync=last_full_sync)
+
+    def load(self, path: str) -> Optional[tList[Task]]:
+        snapshot = load_snapshot(path=path)
+        if snapshot is None:
+            return None
+        teams, lists, tasks, meta = snapshot
+        return self._install(teams=teams, lists=lists, tasks=tasks, last_full_sync=meta.get("last_full_sync", None))
+
+    def _install(self, teams: tList[Team], lists: tList[List], tasks: tList[Task],
+                 last_full_sync: Optional[float]) -> tList[Task]:
+        with self._lock:
+            self._teams = teams
+            self._lists = {x.id: x for x in lists}
+            self._tasks = {x.id: x for x in tasks}
+            self._date_updated = max((x.date_updated for x in tasks if x.date_updated is not None), default=None)
+            self._last_full_sync = last_full_sync
+            return list(self._tasks.values())
+
+    def _merge(self, task: Task) -> Optional[Task]:
+        if self._date_updated is None or (task.date_updated is not None and task.date_updated > self._date_updated):
+            self._date_updated = task.date_updated
+        if task.is_open() or self._with_closed:
+            self._tasks[task.id] = task
+            return task
+        self._tasks.pop(task.id, None)
+        return None
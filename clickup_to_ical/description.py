@@ -0,0 +1,101 @@
+import hashlib
+import html
+import os
+import re
+from typing import List, Optional
+
+from clickup_to_ical.utils import LRUCache
+
+# Plain text of task descriptions keyed on a hash of their markdown, so a description is only converted again once
+# its content changed and not whenever anything else of its task changed
+_CACHE = LRUCache(max_size=int(os.environ.get("DESCRIPTION_CACHE_SIZE", 16)) * 1024 * 1024)
+_MAX_LENGTH = int(os.environ.get("DESCRIPTION_MAX_LENGTH", 10000))
+# "markdown" converts with markdown and BeautifulSoup like before, exact but a lot slower
+_CONVERTER = os.environ.get("DESCRIPTION_CONVERTER", "fast").lower()
+
+_FENCE = re.compile(r"^\s{0,3}(```|~~~)")
+_BLOCK = re.compile(
+    r"^\s{0,3}(?:"
+    r"#{1,6}\s+|"  # headings
+    r">\s?|"  # quotes
+    r"(?:[*+-]|\d+[.)])\s+(?:\[[ xX]]\s+)?"  # list items and checkboxes
+    r")"
+)
+_RULE = re.compile(r"^\s{0,3}([-*_])(?:\s*\1){2,}\s*$")
+_HEADING_END = re.compile(r"\s+#+\s*$")
+_INLINE = re.compile(
+    r"!?\[([^\]]*)]\([^)]*\)|"  # images and links keep their text
+    r"(`+)(.+?)\2|"  # code
+    r"(\*\*\*|\*\*|__|~~)(?=\S)(.+?)(?<=\S)\4|"  # bold and strikethrough
+    r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?![\w*])|"  # emphasis, but not 2*3*4
+    r"(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)|"  # emphasis, but not snake_case
+    r"<[a-zA-Z/][^>\n]*>|"  # inline html tags
+    r"\\([\\`*_{}\[\]()#+\-.!|>~])"  # escaped characters
+)
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _inline(match: re.Match) -> str:
+    for group in (1, 3, 5, 6, 7, 8):
+        if match.group(group) is not None:
+            return match.group(group) if group in (1, 3, 8) else _INLINE.sub(_inline, match.group(group))
+    return ""
+
+
+def _prose(lines: List[str]) -> str:
+    return html.unescape(_BLANK_LINES.sub("\n\n", _INLINE.sub(_inline, "\n".join(lines))))
+
+
+def _fast(text: str) -> str:
+    # One pass over the lines drops the block syntax, one regex pass per text between code blocks the inline syntax.
+    # Code blocks stay as they are.
+    parts, lines, in_code = [], [], False
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            if len(lines) > 0:
+                parts.append("\n".join(lines) if in_code else _prose(lines))
+            lines, in_code = [], not in_code
+            continue
+        if in_code:
+            lines.append(line)
+        elif _RULE.match(line):
+            lines.append("")
+        else:
+            block = _BLOCK.match(line)
+            if block is None:
+                lines.append(line.rstrip())
+            elif block.group().lstrip().startswith("#"):
+                lines.append(_HEADING_END.sub("", line[block.end():]).rstrip())
+            else:
+                lines.append(line[block.end():].rstrip())
+    if len(lines) > 0:
+        parts.append("\n".join(lines) if in_code else _prose(lines))
+    return "\n".join(parts).strip()
+
+
+def _markdown(text: str) -> str:
+    from markdown import markdown
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markdown(text), features='html.parser').get_text()
+
+
+def _truncate(text: str, max_length: int) -> str:
+    if max_length <= 0 or len(text) <= max_length:
+        return text
+    cut = text.rfind(" ", 0, max_length - 1)
+    return text[:cut if cut > max_length // 2 else max_length - 1].rstrip() + "…"
+
+
+def markdown_to_text(text: str, converter: Optional[str] = None) -> str:
+    return (_markdown if (converter or _CONVERTER) == "markdown" else _fast)(text)
+
+
+def description_text(markdown_description: Optional[str]) -> Optional[str]:
+    if markdown_description is None or len(markdown_description) <= 0:
+        return None
+    key = hashlib.blake2b(markdown_description.encode("utf-8"), digest_size=16).digest()
+    text = _CACHE.get(key, None)
+    if text is None:
+        text = _truncate(markdown_to_text(markdown_description), max_length=_MAX_LENGTH)
+        _CACHE.set(key, text)
+    return text
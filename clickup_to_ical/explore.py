@@ -1,34 +1,167 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, Executor
+from typing import Optional
+
+# Levels of the workspace, --depth stops crawling after the given one
+_DEPTHS = ("teams", "spaces", "lists")
+
+
+def _member_json(member) -> dict:
+    return {"id": member.id, "username": member.username, "email": member.email}
+
+
+def _count_tasks(lst, count: str, pages: Executor, client) -> dict:
+    # The task count Clickup reports for a list is enough to tell lists apart and costs no request. It does not
+    # reliably include closed tasks and subtasks, --count exact downloads all of them instead.
+    from clickup_to_ical.clickup import get_tasks
+    t1 = time.perf_counter()
+    if count == "reported" and lst.task_count is not None:
+        tasks, source = lst.task_count, "reported"
+    elif count == "none":
+        tasks, source = None, None
+    else:
+        tasks = len(get_tasks(lst=lst, with_closed=True, with_subtasks=True, executor=pages, client=client))
+        source = "downloaded"
+    t2 = time.perf_counter()
+    return {"id": lst.id, "name": lst.name, "tasks": tasks, "counted": source, "seconds": t2 - t1}
+
+
+def explore(depth: str = "lists", count: str = "reported", client=None) -> dict:
+    # Crawls the workspace with a pool, all requests share the rate limit of the client. Jobs are submitted level by
+    # level and only waited for when printing, so lists are counted while other folders are still requested.
+    from clickup_to_ical.clickup import Client, get_teams, get_spaces, get_folders, get_lists
+    client = Client() if client is None else client
+    level = _DEPTHS.index(depth)
+    t1 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=client.workers, thread_name_prefix="clickup-explore") as pool, \
+            ThreadPoolExecutor(max_workers=client.workers, thread_name_prefix="clickup-page") as pages:
+
+        def _lists(origin) -> list:
+            return [pool.submit(_count_tasks, x, count, pages, client) for x in get_lists(origin=origin, client=client)]
+
+        def _folder(folder) -> dict:
+            return {"id": folder.id, "name": folder.name, "lists": _lists(folder)}
+
+        def _space(space) -> dict:
+            result = {"id": space.id, "name": space.name}
+            if level >= 2:
+                result["lists"] = pool.submit(_lists, space)
+                result["folders"] = [pool.submit(_folder, x) for x in get_folders(space=space, client=client)]
+            return result
+
+        teams = get_teams(client=client)
+        result = [{"id": x.id, "name": x.name, "members": [_member_json(y) for y in x.members],
+                   "spaces": [pool.submit(_space, y) for y in get_spaces(team=x, client=client)] if level >= 1 else []}
+                  for x in teams]
+        for team in result:
+            team["spaces"] = [x.result() for x in team["spaces"]]
+            for space in team["spaces"]:
+                if level >= 2:
+                    space["lists"] = [x.result() for x in space["lists"].result()]
+                    space["folders"] = [x.result() for x in space["folders"]]
+                    for folder in space["folders"]:
+                        folder["lists"] = [x.result() for x in folder["lists"]]
+    t2 = time.perf_counter()
+    calls, api_time = client.stats()
+    return {"teams": result, "depth": depth, "count": count, "seconds": t2 - t1, "api_calls": calls,
+            "api_seconds": api_time, "created": time.time()}
+
+
+def _cache_path(cache_dir: str, api_key: str, depth: str, count: str) -> str:
+    # Never store the api key itself, only enough of a hash to keep the workspaces of different keys apart
+    key = hashlib.blake2b(f"{api_key}|{depth}|{count}".encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"explore-{key}.json")
+
+
+def _load_cache(path: str, max_age: float) -> Optional[dict]:
+    try:
+        with open(path, "r") as f_in:
+            result = json.load(f_in)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - result.get("created", 0) > max_age:
+        return None
+    return result
+
+
+def _save_cache(path: str, result: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f_out:
+        json.dump(result, f_out)
+    os.replace(tmp, path)
+
+
+def _print_lists(lists: list, indent: int):
+    for x in lists:
+        tasks = "" if x["tasks"] is None else f": {x['tasks']} tasks"
+        print(f"{' ' * indent}-> List-{x['name']} ({x['id']}){tasks}")
+
+
+def _print(result: dict):
+    print("Your available resources:")
+    for t in result["teams"]:
+        members = t["members"]
+        described = ", ".join(f"Member-{y['username']} ({y['id']})" for y in members) if len(members) < 5 else \
+            f"{len(members)} members"
+        print(f"Team-{t['name']} ({t['id']}): {described}")
+        for s in t["spaces"]:
+            print(f"{' ' * 2}-> Space-{s['name']} ({s['id']})")
+            _print_lists(s.get("lists", []), indent=4)
+            for f in s.get("folders", []):
+                print(f"{' ' * 4}-> Folder-{f['name']} ({f['id']})")
+                _print_lists(f["lists"], indent=6)
 
 
 def main():
+    import argparse
     import logging
-    from clickup_to_ical.clickup import get_teams, get_spaces, get_lists, get_folders, get_tasks
-
-    teams = {x.id: x for x in get_teams()}
-    logging.info(f"Found {len(teams)} teams")
-
-    spaces = {}
-    folders = {}
-    lists = {}
-    for t in teams.values():
-        spaces[t.id] = {x.id: x for x in get_spaces(team=t)}
-        for s in spaces[t.id].values():
-            lists[s.id] = {x.id: x for x in get_lists(origin=s)}
-            folders[s.id] = {x.id: x for x in get_folders(space=s)}
-            for f in folders[s.id].values():
-                lists[f.id] = {x.id: x for x in get_lists(origin=f)}
+    from clickup_to_ical.clickup import Client, require_api_key
 
-    print("Your available resources:")
-    for t in teams.values():
-        print(f"{t}: {', '.join(f'{y}' for y in t.members) if len(t.members) < 5 else f'{len(t.members)} members'}")
-        for s in spaces[t.id].values():
-            print(f"{' ' * 2}-> {s}")
-            for l in lists[s.id].values():
-                print(f"{' ' * 4}-> {l}: {len(get_tasks(lst=l, with_closed=True, with_subtasks=True))} tasks")
-            for f in folders[s.id].values():
-                print(f"{' ' * 4}-> {f}")
-                for l in lists[f.id].values():
-                    print(f"{' ' * 6}-> {l}: {len(get_tasks(lst=l, with_closed=True, with_subtasks=True))} tasks")
+    parser = argparse.ArgumentParser(description="Lists the teams, members, spaces, folders and lists the Clickup api "
+                                                 "key can see, to find the user ids for the auth.json")
+    parser.add_argument("--depth", type=str, choices=_DEPTHS, default="lists", help="Last level to crawl")
+    parser.add_argument("--count", type=str, choices=("reported", "exact", "none"), default="reported",
+                        help="Task counts of lists as reported by Clickup, by downloading all tasks or not at all")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent requests, defaults to CLICKUP_WORKERS")
+    parser.add_argument("--rate-limit", type=int, default=None,
+                        help="Requests per minute, defaults to CLICKUP_RATE_LIMIT. Keep it below the budget of the api "
+                             "key, so a server running with the same key is not throttled")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON with timings per list")
+    parser.add_argument("--cache-dir", type=str,
+                        default=os.path.join(tempfile.gettempdir(), "clickup_to_ical-explore"),
+                        help="Directory results are cached in")
+    parser.add_argument("--max-age", type=float, default=60 * 60, help="Seconds a cached result is used for")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cache and crawl again")
+    args = parser.parse_args()
+
+    # Logs go to stderr, so the output of --json can be piped
+    logging.basicConfig(style="{", format="{asctime} - {levelname:^8} - {name} - {message}",
+                        datefmt="%Y-%m-%d %H:%M:%S", level=logging.INFO)
+    require_api_key()
+    path = _cache_path(args.cache_dir, api_key=os.environ["CLICKUP_API_KEY"], depth=args.depth, count=args.count)
+    result = None if args.refresh else _load_cache(path, max_age=args.max_age)
+    if result is None:
+        client = Client(rate_limit=args.rate_limit, workers=args.workers, name="explore")
+        result = explore(depth=args.depth, count=args.count, client=client)
+        result["cached"] = False
+        try:
+            _save_cache(path, result)
+        except OSError:
+            logging.exception(f"Failed to cache the result in {path}")
+    else:
+        result["cached"] = True
+        logging.info(f"Using the result from {time.ctime(result['created'])} cached in {path}, --refresh crawls again")
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print(result)
+        logging.info(f"Explored in {result['seconds']:.2f}s with {result['api_calls']} api calls")
 
 
 if __name__ == '__main__':
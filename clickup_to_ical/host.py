@@ -4,7 +4,7 @@ TRUE_VALUES = ("true", "1", "yes", "y", "on")
 def main():
     import os
     import logging
-    from clickup_to_ical.web import app
+    from clickup_to_ical.clickup import require_api_key
 
     debug_enabled = os.environ.get("DEBUG", "").lower() in TRUE_VALUES
     logging.basicConfig(
@@ -13,6 +13,20 @@ def main():
         datefmt="%Y-%m-%d %H:%M:%S",
         level=logging.DEBUG if debug_enabled else logging.INFO
     )
+    # With a TENANTS_FILE every tenant brings its own api key
+    if "TENANTS_FILE" not in os.environ:
+        require_api_key()
+
+    if os.environ.get("WEB_SERVER", "flask").lower() == "gunicorn":
+        from clickup_to_ical.server import serve
+        serve(
+            host="0.0.0.0", port=int(os.environ.get("FLASK_PORT", 8080)),
+            workers=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)),
+            threads=int(os.environ.get("WEB_THREADS", 8)),
+        )
+        return
+
+    from clickup_to_ical.web import app
 
     app.run(host="0.0.0.0", port=os.environ.get("FLASK_PORT", 8080), debug=debug_enabled)
 
@@ -1,18 +1,8 @@
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
-from typing import List
+from datetime import datetime
+from typing import List, Iterator
 
-import pytz
-
-
-def _datetime_to_str(dt_name: str, dt: datetime) -> str:
-    base = f"{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}"
-    if dt.tzinfo is None:
-        return f"{dt_name}:{base}"
-    elif dt.tzinfo in (pytz.UTC, timezone.utc, pytz.timezone("UTC")):
-        return f"{dt_name}:{base}Z"
-    else:
-        return f"{dt_name};TZID={dt.tzinfo};VALUE=DATE:{base}"
+from clickup_to_ical.ical.utils import escape_text, escape_param, fold_lines, datetime_to_str
 
 
 @dataclass(frozen=True)
@@ -21,7 +11,7 @@ class User:
     name: str = None
 
     def __str__(self, user_type: str = "ATTENDEE"):
-        return f"{user_type}{'' if self.name is None else f';CN={self.name}'}:{self.uri}"
+        return f"{user_type}{'' if self.name is None else f';CN={escape_param(self.name)}'}:{self.uri}"
 
 
 @dataclass(frozen=True)
@@ -44,37 +34,46 @@ class Event:
     attendees: List[User] = field(default_factory=list)
 
     def __str__(self):
-        from clickup_to_ical.ical.calendar import escape_nl
+        return "\n".join(self.iter_lines())
+
+    def to_ical(self) -> str:
+        return fold_lines(self._lines())
+
+    def iter_lines(self) -> Iterator[str]:
+        yield from self._lines()
+
+    def _lines(self) -> List[str]:
         ret = [
+            "BEGIN:VEVENT",
             f"UID:{self.uid}",
-            _datetime_to_str("DTSTAMP", self.dtstamp),
-            _datetime_to_str("DTSTART", self.dtstart)
+            datetime_to_str("DTSTAMP", self.dtstamp),
+            datetime_to_str("DTSTART", self.dtstart)
         ]
 
         if self.dtend is not None:
-            ret.append(_datetime_to_str("DTEND", self.dtend))
+            ret.append(datetime_to_str("DTEND", self.dtend))
         if self.created is not None:
-            ret.append(_datetime_to_str("CREATED", self.created))
+            ret.append(datetime_to_str("CREATED", self.created))
         if self.last_modified is not None:
-            ret.append(_datetime_to_str("LAST-MODIFIED", self.created))
+            ret.append(datetime_to_str("LAST-MODIFIED", self.last_modified))
         if self.url is not None:
             ret.append(f"URL:{self.url}")
         if self.location is not None:
-            ret.append(f"LOCATION:{escape_nl(self.location)}")
+            ret.append(f"LOCATION:{escape_text(self.location)}")
         if self.summary is not None:
-            ret.append(f"SUMMARY:{escape_nl(self.summary)}")
+            ret.append(f"SUMMARY:{escape_text(self.summary)}")
         if self.description is not None:
-            ret.append(f"DESCRIPTION:{escape_nl(self.description)}")
+            ret.append(f"DESCRIPTION:{escape_text(self.description)}")
         if self.sequence is not None:
-            ret.append(f"SEQUENCE:{escape_nl(self.sequence)}")
+            ret.append(f"SEQUENCE:{self.sequence}")
         if self.transp is not None:
-            ret.append(f"TRANSP:{escape_nl(self.transp)}")
+            ret.append(f"TRANSP:{escape_text(self.transp)}")
         if self.status is not None:
-            ret.append(f"STATUS:{escape_nl(self.status)}")
+            ret.append(f"STATUS:{escape_text(self.status)}")
         if self.priority is not None:
-            ret.append(f"PRIORITY:{escape_nl(self.priority)}")
+            ret.append(f"PRIORITY:{self.priority}")
         if self.organizer is not None:
-            ret.append(escape_nl(self.organizer.__str__(user_type="ORGANIZER")))
-        ret.extend(escape_nl(x.__str__(user_type="ATTENDEE")) for x in self.attendees)
-
-        return "BEGIN:VEVENT\n{}\nEND:VEVENT".format("\n".join(ret))
+            ret.append(self.organizer.__str__(user_type="ORGANIZER"))
+        ret.extend(x.__str__(user_type="ATTENDEE") for x in self.attendees)
+        ret.append("END:VEVENT")
+        return ret
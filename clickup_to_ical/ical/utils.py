@@ -0,0 +1,95 @@
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, List
+
+import pytz
+
+_ICALENDAR_MAX_LINE_LENGTH = 75
+
+# Line breaks besides \n that have to end up as an escaped \n in TEXT values
+_LINE_BREAKS = re.compile("[\r\x0b\x0c\x85\u2028\u2029]")
+_PARAM_SPECIAL = re.compile("[:;,]")
+
+
+def escape_text(text: Any) -> str:
+    # TEXT values (RFC 5545 3.3.11) escape backslashes, semicolons, commas and line breaks.
+    # Chained str.replace calls are a lot faster than str.translate for the short values of an event.
+    text = str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    if _LINE_BREAKS.search(text) is not None:
+        text = _LINE_BREAKS.sub("\n", text.replace("\r\n", "\n"))
+    return text.replace("\n", "\\n")
+
+
+@lru_cache(maxsize=4096)
+def escape_param(text: Any) -> str:
+    text = str(text).replace("\"", "'").replace("\n", " ").replace("\r", " ")
+    if _PARAM_SPECIAL.search(text) is not None:
+        return f"\"{text}\""
+    return text
+
+
+def _fold_ascii(line: str) -> str:
+    parts = [line[:_ICALENDAR_MAX_LINE_LENGTH]]
+    parts.extend(
+        line[x:x + _ICALENDAR_MAX_LINE_LENGTH - 1]
+        for x in range(_ICALENDAR_MAX_LINE_LENGTH, len(line), _ICALENDAR_MAX_LINE_LENGTH - 1)
+    )
+    return "\r\n ".join(parts)
+
+
+def fold_line(line: str) -> str:
+    # Lines are limited to 75 octets (RFC 5545 3.1), continuation lines start with a single space
+    if line.isascii():
+        return line if len(line) <= _ICALENDAR_MAX_LINE_LENGTH else _fold_ascii(line)
+
+    data = line.encode("utf-8")
+    if len(data) <= _ICALENDAR_MAX_LINE_LENGTH:
+        return line
+    parts = []
+    start, limit = 0, _ICALENDAR_MAX_LINE_LENGTH
+    while len(data) - start > limit:
+        end = start + limit
+        # Never cut inside a multi byte utf-8 sequence
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end])
+        start, limit = end, _ICALENDAR_MAX_LINE_LENGTH - 1
+    parts.append(data[start:])
+    return b"\r\n ".join(parts).decode("utf-8")
+
+
+def fold_lines(lines: List[str]) -> str:
+    text = "\r\n".join(lines)
+    if not text.isascii():
+        return "\r\n".join(map(fold_line, lines))
+    # For ascii characters and octets are the same, most lines are short enough to not need folding at all
+    if max(map(len, lines), default=0) <= _ICALENDAR_MAX_LINE_LENGTH:
+        return text
+    return "\r\n".join([x if len(x) <= _ICALENDAR_MAX_LINE_LENGTH else _fold_ascii(x) for x in lines])
+
+
+def datetime_to_str(dt_name: str, dt: datetime) -> str:
+    # isoformat is implemented in C and a lot cheaper than formatting every component on its own
+    base = dt.isoformat()[:19].replace("-", "").replace(":", "")
+    tzinfo = dt.tzinfo
+    if tzinfo is None:
+        return f"{dt_name}:{base}"
+    elif tzinfo is pytz.UTC or tzinfo is timezone.utc:
+        return f"{dt_name}:{base}Z"
+    else:
+        return f"{dt_name};TZID={escape_param(tzinfo)}:{base}"
+
+
+def time_to_duration(td: timedelta) -> str:
+    days = td.days
+    hours, remainder = divmod(td.seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    h = f"{f'{hours:02d}H' if hours > 0 else ''}"
+    m = f"{f'{minutes:02d}M' if minutes > 0 else ''}"
+    s = f"{f'{seconds:02d}S' if seconds > 0 else ''}"
+
+    if days <= 0 and len(h + m + s) <= 0:
+        return "PT0S"
+    return f"P{f'{days}D' if days > 0 else ''}{f'T{h}{m}{s}' if len(h + m + s) > 0 else ''}"
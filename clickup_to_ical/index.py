@@ -0,0 +1,136 @@
+import hashlib
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from heapq import merge
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from clickup_to_ical.clickup.data import Task
+
+
+class EventRecord(NamedTuple):
+    task: Task
+    name: str
+    date: datetime
+
+
+def task_records(task: Task) -> Tuple[EventRecord, ...]:
+    return tuple(EventRecord(task=task, name=k, date=v) for k, v in task.get_all_dates().items())
+
+
+def render_version(task: Task) -> tuple:
+    # Everything the events of a task are rendered from. Clickup bumps date_updated of a task whenever the task or
+    # its parents change, but not when one of its custom fields or members gets renamed.
+    members = task.get_member_index()
+    version = [
+        tuple(x.name for x, _ in task.custom_fields if x.type == "date"),
+        tuple((x, members[x].username, members[x].email) if x in members else (x,)
+              for x in (task.creator, *task.assignees)),
+    ]
+    while isinstance(task, Task):
+        version.append((task.id, task.date_updated))
+        task = task.parent
+    if task is not None:
+        version.append(task)
+    return tuple(version)
+
+
+class TaskIndex:
+    # The tasks of one assignee (or everyone) and their event records grouped by lowercase date name and open state.
+    # Key None holds the records of all date names. Records keep their position, so merging groups keeps the order.
+    # Every group is also kept sorted by date, so a time window is found by binary search.
+    __slots__ = ("entries", "_groups", "_by_date", "_version")
+
+    def __init__(self, entries: Iterable[Tuple[Task, Tuple[EventRecord, ...]]]):
+        self.entries = tuple(entries)
+        self._version: Optional[str] = None
+        groups: Dict[Tuple[Optional[str], bool], List[Tuple[int, EventRecord]]] = defaultdict(list)
+        position = 0
+        for task, records in self.entries:
+            is_open = task.is_open()
+            for record in records:
+                item = (position, record)
+                groups[(None, is_open)].append(item)
+                groups[(record.name.lower(), is_open)].append(item)
+                position += 1
+        self._groups = {k: tuple(v) for k, v in groups.items()}
+        self._by_date = {}
+        for k, v in self._groups.items():
+            items = sorted(((x.date.timestamp(), i, x) for i, x in v), key=lambda item: item[:2])
+            self._by_date[k] = ([x for x, _, _ in items], tuple(items))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __eq__(self, other):
+        # Indexes rendering the same events are equal, so a poll that changed nothing does not publish a new snapshot
+        return self is other or getattr(other, "version", None) == self.version
+
+    @property
+    def version(self) -> str:
+        # Digest of everything the events of the tasks are rendered from. The same in every process that indexes the
+        # same tasks, unlike the generation of a store. Tasks get linked to new parents in place, so an index whose
+        # tasks got a new parent has to be built again to get a new version.
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for task, _ in self.entries:
+                digest.update(f"{render_version(task)!r}\n".encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def __iter__(self) -> Iterator[Task]:
+        return (x for x, _ in self.entries)
+
+    def groups(self) -> Dict[Tuple[Optional[str], bool], Tuple[Tuple[int, EventRecord], ...]]:
+        return self._groups
+
+    def event_count(self) -> int:
+        return sum(len(v) for (name, _), v in self._groups.items() if name is None)
+
+    def task_ids(self) -> Set[str]:
+        # Only tasks with at least one date, the others never have rendered events
+        return {x.id for x, records in self.entries if len(records) > 0}
+
+    def records(self, date_types: Optional[Iterable[str]], include_closed: bool, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> Iterator[EventRecord]:
+        names = (None,) if date_types is None else tuple(dict.fromkeys(date_types))
+        states = (True, False) if include_closed else (True,)
+        keys = [(n, s) for n in names for s in states if (n, s) in self._groups]
+        if start is None and end is None:
+            groups = [self._groups[k] for k in keys]
+            if len(groups) == 1:
+                return (x for _, x in groups[0])
+            return (x for _, x in merge(*groups, key=lambda item: item[0]))
+
+        # Events inside the window are returned ordered by date
+        groups = []
+        for k in keys:
+            dates, items = self._by_date[k]
+            lo = 0 if start is None else bisect_left(dates, start.timestamp())
+            hi = len(dates) if end is None else bisect_left(dates, end.timestamp(), lo)
+            groups.append(items[lo:hi])
+        if len(groups) == 1:
+            return (x for _, _, x in groups[0])
+        return (x for _, _, x in merge(*groups, key=lambda item: item[:2]))
+
+    def replace(self, task_id: str, entry: Optional[Tuple[Task, Tuple[EventRecord, ...]]]) -> "TaskIndex":
+        # Records of all other tasks are reused, only the groups are built again
+        entries = list(self.entries)
+        position = next((i for i, (x, _) in enumerate(entries) if x.id == task_id), None)
+        if position is not None and entry is not None:
+            entries[position] = entry
+        elif position is not None:
+            del entries[position]
+        elif entry is not None:
+            entries.append(entry)
+        return TaskIndex(entries)
+
+
+def build_indexes(tasks: Iterable[Task]) -> Dict[Optional[int], TaskIndex]:
+    entries: Dict[Optional[int], list] = defaultdict(list)
+    for task in tasks:
+        entry = (task, task_records(task))
+        entries[None].append(entry)
+        for assignee in task.assignees:
+            entries[assignee].append(entry)
+    return {k: TaskIndex(v) for k, v in entries.items()}
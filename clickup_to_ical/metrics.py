@@ -0,0 +1,233 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from logging import getLogger
+from typing import Dict, List, Sequence
+
+_LOGGER = getLogger("clickup_to_ical")
+
+# Every process keeps its own metrics. With METRICS_DIR set every process also dumps them there regularly and
+# /metrics adds up the dumps of all processes, so it does not matter which worker answers the scrape.
+_METRICS: List["_Metric"] = []
+_DUMP_RATE = int(os.environ.get("METRICS_DUMP_RATE", 5))
+_DUMP_THREAD = None
+_DUMP_LOCK = threading.Lock()
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    labels = [f"{x}=\"{_escape(y)}\"" for x, y in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if len(labels) > 0 else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+        _METRICS.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[x]) for x in self.labels)
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    def _merge(self, values: dict, state: list):
+        for k, v in state:
+            k = tuple(k)
+            values[k] = values[k] + v if k in values else v
+
+    def _samples(self, values: dict) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in sorted(values.items())]
+
+    def render(self, states: List[list]) -> str:
+        values = {}
+        for state in [self.state()] + states:
+            self._merge(values, state)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(values))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _merge(self, values: dict, state: list):
+        # The same gauge is set in every process that knows it (snapshot sizes) or in just one (sync state)
+        for k, v in state:
+            k = tuple(k)
+            values[k] = max(values[k], v) if k in values else v
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key, None)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1], v[2]]] for k, v in self._values.items()]
+
+    def _merge(self, values: dict, state: list):
+        for k, v in state:
+            k = tuple(k)
+            if k not in values:
+                values[k] = [list(v[0]), v[1], v[2]]
+            else:
+                values[k] = [[x + y for x, y in zip(values[k][0], v[0])], values[k][1] + v[1], values[k][2] + v[2]]
+
+    def _samples(self, values: dict) -> List[str]:
+        lines = []
+        for k, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "le=\"{}\"".format("+Inf" if bound == float("inf") else bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, k, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, k)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, k)} {count}")
+        return lines
+
+
+class Timer:
+    # Adds the time spent inside the with block to a phase of a timings dict
+    def __init__(self, timings: Dict[str, float], phase: str):
+        self._timings = timings
+        self._phase = phase
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._timings[self._phase] = self._timings.get(self._phase, 0) + time.perf_counter() - self._start
+
+
+def _dump_file() -> str:
+    return os.path.join(os.environ["METRICS_DIR"], f"{os.getpid()}.json")
+
+
+def dump():
+    data = json.dumps({x.name: x.state() for x in _METRICS})
+    fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", dir=os.environ["METRICS_DIR"])
+    with os.fdopen(fd, "w") as f_out:
+        f_out.write(data)
+    os.replace(tmp_path, _dump_file())
+
+
+def _dump_forever():
+    while True:
+        time.sleep(_DUMP_RATE)
+        try:
+            dump()
+        except Exception:
+            _LOGGER.exception("Failed to dump metrics")
+
+
+def start_dumping():
+    # Called in every process once it is set up, forked processes need their own thread
+    global _DUMP_THREAD
+    if "METRICS_DIR" not in os.environ:
+        return
+    with _DUMP_LOCK:
+        if _DUMP_THREAD is not None and _DUMP_THREAD[0] == os.getpid():
+            return
+        thread = threading.Thread(target=_dump_forever, daemon=True)
+        thread.start()
+        _DUMP_THREAD = (os.getpid(), thread)
+
+
+def _other_states() -> Dict[str, List[list]]:
+    states: Dict[str, List[list]] = {}
+    if "METRICS_DIR" not in os.environ:
+        return states
+    own = _dump_file()
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+        if path == own:
+            continue
+        try:
+            with open(path, "r") as f_in:
+                data = json.load(f_in)
+        except (OSError, ValueError):
+            continue
+        for name, state in data.items():
+            states.setdefault(name, []).append(state)
+    return states
+
+
+def render() -> str:
+    states = _other_states()
+    return "\n".join(x.render(states.get(x.name, [])) for x in _METRICS) + "\n"
+
+
+def phase_header(timings: Dict[str, float], **descriptions) -> str:
+    parts = [f"{k};dur={v * 1000:.2f}" for k, v in timings.items()]
+    parts.extend(f"{k};desc=\"{_escape(v)}\"" for k, v in descriptions.items())
+    return ", ".join(parts)
+
+
+SYNC_DURATION = Histogram("clickup_to_ical_sync_duration_seconds", "Duration of task syncs with Clickup",
+                          ("type", "tenant"))
+SYNC_LAST_SUCCESS = Gauge("clickup_to_ical_sync_last_success_timestamp_seconds", "Time of the last successful sync",
+                          ("tenant",))
+UPDATE_FAILURES = Counter("clickup_to_ical_update_failures_total", "Failed background updates",
+                          ("updater", "tenant"))
+API_REQUESTS = Counter("clickup_to_ical_api_requests_total", "Requests to the Clickup API", ("endpoint", "status"))
+API_DURATION = Histogram("clickup_to_ical_api_request_duration_seconds", "Round trip of Clickup API requests",
+                         ("endpoint",))
+API_RETRIES = Counter("clickup_to_ical_api_retries_total", "Retried requests to the Clickup API",
+                      ("endpoint", "reason"))
+API_RATE_LIMIT_WAIT = Counter("clickup_to_ical_api_rate_limit_wait_seconds_total",
+                              "Time spent waiting for the rate limiter before Clickup API requests")
+SNAPSHOT_SIZE = Gauge("clickup_to_ical_snapshot_size", "Size of the current task snapshot", ("kind", "tenant"))
+CALENDAR_REQUESTS = Counter("clickup_to_ical_calendar_requests_total", "Calendar requests", ("status",))
+CALENDAR_CACHE = Counter("clickup_to_ical_calendar_cache_total", "Calendar cache lookups", ("result",))
+EVENT_CACHE = Counter("clickup_to_ical_event_cache_total", "Rendered event cache lookups", ("result",))
+CALENDAR_DURATION = Histogram("clickup_to_ical_calendar_duration_seconds",
+                              "Time to produce a calendar response body", ("phase",))
+CALENDAR_SIZE = Histogram("clickup_to_ical_calendar_size_bytes", "Size of calendar response bodies",
+                          ("encoding",), buckets=SIZE_BUCKETS)
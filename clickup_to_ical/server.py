@@ -0,0 +1,137 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from logging import getLogger
+from typing import Callable, Optional
+
+_LOGGER = getLogger("clickup_to_ical")
+
+# Created by the server process before the workers are forked, so every worker can hand webhooks to the fetcher
+_WEBHOOKS: Optional[multiprocessing.Queue] = None
+# A fetcher dying right after its start is only started again after this many seconds
+_RESTART_DELAY = float(os.environ.get("FETCHER_RESTART_DELAY", 5))
+_STOPPING = threading.Event()
+
+
+def start_fetcher() -> multiprocessing.Process:
+    global _WEBHOOKS
+    _WEBHOOKS = multiprocessing.Queue()
+    process = _start_process()
+    # Registered after the one of multiprocessing and therefore called before it terminates the fetcher on exit, so
+    # the fetcher is not started again while shutting down
+    atexit.register(_STOPPING.set)
+    threading.Thread(target=_supervise, args=(process, _start_process), name="clickup_to_ical-fetcher-supervisor",
+                     daemon=True).start()
+    return process
+
+
+def _start_process() -> multiprocessing.Process:
+    # Restarted fetchers get the queue of the first one, the workers forked in the meantime only know that one
+    process = multiprocessing.Process(target=_run, args=(_WEBHOOKS,), name="clickup_to_ical-fetcher", daemon=True)
+    process.start()
+    _LOGGER.info(f"Started fetcher process {process.pid}")
+    return process
+
+
+def _supervise(process: multiprocessing.Process, start: Callable[[], multiprocessing.Process]):
+    # Gunicorn reaps every child of the server process and silently ignores the ones that are not its workers. The
+    # sentinel of the fetcher still tells once it is gone, without a fetcher the calendars would never change again.
+    from multiprocessing.connection import wait
+    while True:
+        started = time.time()
+        wait([process.sentinel])
+        if _STOPPING.is_set():
+            return
+        # The sentinel closes a moment before the process can be reaped, unless gunicorn reaped it already
+        process.join(timeout=1)
+        exitcode = process.exitcode
+        _LOGGER.error(f"Fetcher process {process.pid} exited{'' if exitcode is None else f' with {exitcode}'}, "
+                      f"starting a new one")
+        if _STOPPING.wait(max(0.0, _RESTART_DELAY - (time.time() - started))):
+            return
+        process = start()
+
+
+def forward_webhook(event: dict, tenant: str) -> bool:
+    if _WEBHOOKS is None:
+        _LOGGER.warning(f"Dropping webhook {event.get('event', '')}, there is no fetcher to forward it to")
+        return False
+    _WEBHOOKS.put((tenant, event))
+    return True
+
+
+def _run(webhooks: multiprocessing.Queue):
+    # The only process talking to the Clickup API. Importing the stores starts polling and every poll writes the
+    # shared snapshot the workers read from.
+    os.environ["TASK_SOURCE"] = "clickup"
+    from clickup_to_ical.metrics import start_dumping
+    from clickup_to_ical.web.stores import apply_webhook, save_tasks
+    start_dumping()
+    while True:
+        events = [webhooks.get()]
+        # Webhooks often come in bursts, the snapshot is only written once per burst
+        while True:
+            try:
+                events.append(webhooks.get(timeout=1))
+            except queue.Empty:
+                break
+        changed = set()
+        for tenant, event in events:
+            try:
+                if apply_webhook(event=event, tenant=tenant):
+                    changed.add(tenant)
+            except Exception:
+                _LOGGER.exception(f"Failed to apply webhook {event.get('event', '')} of {tenant}")
+        for tenant in changed:
+            save_tasks(tenant=tenant)
+
+
+def serve(host: str, port: int, workers: int, threads: int):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        _LOGGER.error("WEB_SERVER=gunicorn needs gunicorn, install clickup_to_ical[server]")
+        exit(1)
+
+    class _Application(BaseApplication):
+        def __init__(self, options: dict):
+            self._options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self._options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported in every worker after the fork, so no worker inherits threads from the server process
+            from clickup_to_ical.metrics import start_dumping
+            from clickup_to_ical.web import app
+            start_dumping()
+            return app
+
+    # Every process dumps its metrics here, so /metrics of any worker reports the numbers of all processes
+    metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "clickup_to_ical-metrics"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".json"):
+            os.remove(os.path.join(metrics_dir, name))
+
+    if os.environ.get("TASK_SOURCE", "clickup").lower() not in ("snapshot", "shared"):
+        # One fetcher process polls Clickup and writes the shared snapshot, all workers map the same file
+        os.environ.setdefault("SHARED_SNAPSHOT_FILE", os.path.join(tempfile.gettempdir(), "clickup_to_ical-shared.bin"))
+        start_fetcher()
+        os.environ["TASK_SOURCE"] = "shared"
+
+    _LOGGER.info(f"Serving on {host}:{port} with {workers} workers and {threads} threads each")
+    _Application({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "preload_app": False,
+        "accesslog": None,
+    }).run()
@@ -0,0 +1,192 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from dataclasses import asdict
+from datetime import datetime, timezone
+from heapq import merge
+from typing import Dict, Iterable, Iterator, List as tList, Optional, Set
+
+from clickup_to_ical.clickup.data import Team, List, Task
+from clickup_to_ical.clickup.decode import loads
+from clickup_to_ical.clickup.snapshot import encode_snapshot, encode_task, decode_hierarchy, decode_task
+from clickup_to_ical.utils import LRUCache
+from clickup_to_ical.index import EventRecord, TaskIndex
+
+# A file written by one process and mapped read only by all others. Layout:
+#   magic | meta offset, meta length | task blobs | task table | task ids | record tables | meta
+# The meta (json) holds the hierarchy and the directory of the record tables. Tasks are only decoded when a request
+# needs them, so the bulk of the data exists once in the page cache no matter how many processes map it.
+_MAGIC = b"C2ISHM01"
+_HEADER = struct.Struct("<8sQQ")
+_TASK_ENTRY = struct.Struct("<QI")
+# position in the index, task ordinal, date name id, timestamp
+_RECORD = struct.Struct("<IIId")
+_TASK_CACHE_SIZE = int(os.environ.get("SHARED_SNAPSHOT_TASK_CACHE", 10000))
+
+
+def save_shared_snapshot(path: str, teams: tList[Team], lists: tList[List], tasks: tList[Task],
+                         indexes: Dict[Optional[int], TaskIndex]):
+    ordinals = {x.id: i for i, x in enumerate(tasks)}
+    names: Dict[str, int] = {}
+    body = bytearray(_HEADER.size)
+
+    task_table = []
+    for task in tasks:
+        data = encode_task(task)
+        if data["parent"] in ordinals:
+            data["parent"] = ordinals[data["parent"]]
+        blob = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        task_table.append(_TASK_ENTRY.pack(len(body), len(blob)))
+        body += blob
+    tasks_offset = len(body)
+    body += b"".join(task_table)
+    ids = "\n".join(x.id for x in tasks).encode("utf-8")
+    ids_offset = len(body)
+    body += ids
+
+    directory = {}
+    for key, index in indexes.items():
+        groups = []
+        for (name, is_open), items in index.groups().items():
+            table = [(position, ordinals[x.task.id], names.setdefault(x.name, len(names)), x.date.timestamp())
+                     for position, x in items]
+            offset = len(body)
+            body += b"".join(_RECORD.pack(*x) for x in table)
+            date_offset = len(body)
+            body += b"".join(_RECORD.pack(*x) for x in sorted(table, key=lambda item: (item[3], item[0])))
+            groups.append([name, is_open, offset, len(table), date_offset])
+        directory["null" if key is None else str(key)] = {"tasks": len(index), "groups": groups,
+                                                          "version": index.version}
+
+    meta = encode_snapshot(teams=teams, lists=lists, tasks=[])
+    meta["custom_fields"] = [asdict(x) for x in {y.id: y for x in tasks for y, _ in x.custom_fields}.values()]
+    meta.update({
+        "task_table": [tasks_offset, len(tasks)], "task_ids": [ids_offset, len(ids)],
+        "names": sorted(names, key=names.get), "indexes": directory,
+    })
+    meta_data = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    meta_offset = len(body)
+    body += meta_data
+    body[:_HEADER.size] = _HEADER.pack(_MAGIC, meta_offset, len(meta_data))
+
+    # Written next to the target and swapped in, processes that mapped the old file keep reading the old data
+    fd, tmp_path = tempfile.mkstemp(prefix=".shared-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f_out:
+            f_out.write(body)
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class _Timestamps:
+    # Sequence view on the timestamps of a record table, so bisect works on the mapped data directly
+    def __init__(self, data: mmap.mmap, offset: int, count: int):
+        self._data, self._offset, self._count = data, offset, count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> float:
+        return _RECORD.unpack_from(self._data, self._offset + i * _RECORD.size)[3]
+
+
+class SharedSnapshot:
+    def __init__(self, path: str):
+        with open(path, "rb") as f_in:
+            self._data = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._data)
+        magic, meta_offset, meta_length = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a shared snapshot")
+        meta = loads(self._data[meta_offset:meta_offset + meta_length])
+        self.teams, self._lists, self._custom_fields = decode_hierarchy(meta)
+        self._tasks_offset, self.task_count = meta["task_table"]
+        self._ids = meta["task_ids"]
+        self._names = meta["names"]
+        self._tasks = LRUCache(max_size=_TASK_CACHE_SIZE, size_fn=lambda _: 1)
+        self.indexes = {
+            None if k == "null" else int(k): MappedTaskIndex(snapshot=self, tasks=v["tasks"], groups=v["groups"],
+                                                             version=v.get("version", None))
+            for k, v in meta["indexes"].items()
+        }
+
+    @property
+    def data(self) -> mmap.mmap:
+        return self._data
+
+    def task(self, ordinal: int) -> Task:
+        task = self._tasks.get(ordinal, None)
+        if task is None:
+            offset, length = _TASK_ENTRY.unpack_from(self._data, self._tasks_offset + ordinal * _TASK_ENTRY.size)
+            data = loads(self._data[offset:offset + length])
+            if isinstance(data["parent"], int):
+                data["parent"] = self.task(data["parent"])
+            task = decode_task(data, lists=self._lists, custom_fields=self._custom_fields)
+            self._tasks.set(ordinal, task)
+        return task
+
+    def task_ids(self) -> tList[str]:
+        offset, length = self._ids
+        return self._data[offset:offset + length].decode("utf-8").split("\n") if length > 0 else []
+
+    def record(self, item: tuple) -> EventRecord:
+        _, ordinal, name_id, timestamp = item
+        return EventRecord(task=self.task(ordinal), name=self._names[name_id],
+                           date=datetime.fromtimestamp(timestamp, tz=timezone.utc))
+
+    def table(self, offset: int, count: int) -> Iterator[tuple]:
+        return _RECORD.iter_unpack(self._view[offset:offset + count * _RECORD.size])
+
+
+class MappedTaskIndex:
+    # Same queries as TaskIndex, answered from the record tables of a SharedSnapshot
+    __slots__ = ("_snapshot", "_tasks", "_groups", "version")
+
+    def __init__(self, snapshot: SharedSnapshot, tasks: int, groups: Iterable[list], version: Optional[str] = None):
+        self._snapshot = snapshot
+        self._tasks = tasks
+        # Version of the TaskIndex the tables were written from, files without one only equal themselves
+        self.version = version
+        self._groups = {(name, is_open): (offset, count, date_offset) for name, is_open, offset, count, date_offset
+                        in groups}
+
+    def __len__(self) -> int:
+        return self._tasks
+
+    def __eq__(self, other):
+        return self is other or (self.version is not None and getattr(other, "version", None) == self.version)
+
+    def records(self, date_types: Optional[Iterable[str]], include_closed: bool, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> Iterator[EventRecord]:
+        names = (None,) if date_types is None else tuple(dict.fromkeys(date_types))
+        states = (True, False) if include_closed else (True,)
+        keys = [(n, s) for n in names for s in states if (n, s) in self._groups]
+        if start is None and end is None:
+            tables = [self._snapshot.table(offset, count) for offset, count, _ in (self._groups[k] for k in keys)]
+            items = merge(*tables, key=lambda item: item[0])
+        else:
+            tables = []
+            for offset, count, date_offset in (self._groups[k] for k in keys):
+                timestamps = _Timestamps(self._snapshot.data, date_offset, count)
+                lo = 0 if start is None else bisect_left(timestamps, start.timestamp())
+                hi = count if end is None else bisect_left(timestamps, end.timestamp(), lo)
+                tables.append(self._snapshot.table(date_offset + lo * _RECORD.size, hi - lo))
+            items = merge(*tables, key=lambda item: (item[3], item[0]))
+        return (self._snapshot.record(x) for x in items)
+
+    def event_count(self) -> int:
+        return sum(count for (name, _), (_, count, _) in self._groups.items() if name is None)
+
+    def task_ids(self) -> Set[str]:
+        ids = self._snapshot.task_ids()
+        ordinals = set()
+        for offset, count, _ in (v for (name, _), v in self._groups.items() if name is None):
+            ordinals.update(x[1] for x in self._snapshot.table(offset, count))
+        return {ids[x] for x in ordinals}
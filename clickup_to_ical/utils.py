@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from logging import getLogger
+from types import MappingProxyType
+from typing import Tuple, Callable, Any, Hashable, Mapping, Optional
+
+_LOGGER = getLogger("clickup_to_ical")
+
+
+def _run_update(store, fn: Callable[[], dict]):
+    try:
+        _v = fn()
+        if _v is not None:
+            store.set(_v)
+    except Exception:
+        from clickup_to_ical.metrics import UPDATE_FAILURES
+        name = getattr(fn, "__name__", repr(fn))
+        # Stores shared by all tenants, like the auth file, have no tenant
+        UPDATE_FAILURES.inc(updater=name, tenant=getattr(store, "tenant", None) or "")
+        _LOGGER.exception(f"Failed to update {name}")
+
+
+def _start_auto_update(store, fn: Callable[[], dict], freq: int):
+    def _tmp():
+        while True:
+            _run_update(store, fn)
+            time.sleep(freq)
+
+    threading.Thread(target=_tmp, daemon=True).start()
+
+
+class Scheduler:
+    # Runs the auto updates of many stores on one small pool instead of one thread per store. Like the thread of a
+    # single store, an update is only scheduled again freq seconds after it finished, so it never runs twice at once.
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="clickup_to_ical-update")
+        self._condition = threading.Condition()
+        self._jobs = []
+        self._order = itertools.count()
+        self._thread = None
+
+    def add(self, store, fn: Callable[[], dict], freq: int, delay: float = 0):
+        with self._condition:
+            heapq.heappush(self._jobs, (time.time() + delay, next(self._order), store, fn, freq))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="clickup_to_ical-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._jobs) <= 0 or self._jobs[0][0] > time.time():
+                    self._condition.wait(None if len(self._jobs) <= 0 else self._jobs[0][0] - time.time())
+                _, _, store, fn, freq = heapq.heappop(self._jobs)
+            self._pool.submit(self._execute, store, fn, freq)
+
+    def _execute(self, store, fn: Callable[[], dict], freq: int):
+        try:
+            _run_update(store, fn)
+        finally:
+            self.add(store, fn, freq, delay=freq)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    data: Mapping
+    generation: int
+    published: float
+
+
+class SnapshotDict:
+    # Readers only dereference the current snapshot and never lock. Writers build a new snapshot and publish it
+    # with a single reference assignment, so a reader sees either the complete old or the complete new data.
+    def __init__(self, auto_update: Tuple[Callable[[], dict], int] = None, initial: dict = None,
+                 scheduler: Optional[Scheduler] = None, tenant: Optional[str] = None):
+        self.tenant = tenant
+        self._write_lock = threading.Lock()
+        self._snapshot = Snapshot(
+            data=MappingProxyType({} if initial is None else dict(initial)), generation=0, published=time.time()
+        )
+        self._listeners = []
+        if auto_update is not None:
+            self._freq = auto_update[1]
+            if scheduler is None:
+                _start_auto_update(self, fn=auto_update[0], freq=auto_update[1])
+            else:
+                scheduler.add(self, fn=auto_update[0], freq=auto_update[1])
+        else:
+            self._freq = None
+
+    @property
+    def frequency(self) -> int:
+        return self._freq
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    @property
+    def updated(self) -> float:
+        return self._snapshot.published
+
+    def subscribe(self, fn: Callable[[], Any]):
+        self._listeners.append(fn)
+
+    def set(self, data: dict):
+        with self._write_lock:
+            if data == self._snapshot.data:
+                return
+            self._publish(dict(data))
+        self._notify()
+
+    def update(self, data: dict):
+        with self._write_lock:
+            new_data = dict(self._snapshot.data)
+            new_data.update(data)
+            self._publish(new_data)
+        self._notify()
+
+    def _publish(self, data: dict):
+        self._snapshot = Snapshot(
+            data=MappingProxyType(data), generation=self._snapshot.generation + 1, published=time.time()
+        )
+
+    def _notify(self):
+        for fn in self._listeners:
+            fn()
+
+    def __getitem__(self, k):
+        r = self.get(k, None)
+        if r is None:
+            raise KeyError(f"Key {k} not found in dictionary")
+        return r
+
+    def get(self, k, default=None):
+        return self._snapshot.data.get(k, default)
+
+
+class LRUCache:
+    def __init__(self, max_size: int, size_fn: Callable[[Any], int] = len):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._max_size = max_size
+        self._size_fn = size_fn
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, k: Hashable, default=None):
+        with self._lock:
+            if k not in self._data:
+                return default
+            self._data.move_to_end(k)
+            return self._data[k][0]
+
+    def set(self, k: Hashable, v: Any):
+        size = self._size_fn(v)
+        if size > self._max_size:
+            return
+        with self._lock:
+            if k in self._data:
+                self._size -= self._data.pop(k)[1]
+            self._data[k] = (v, size)
+            self._size += size
+            while self._size > self._max_size:
+                self._size -= self._data.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def prune(self, keep: Callable[[Hashable], bool]):
+        with self._lock:
+            for k in [x for x in self._data.keys() if not keep(x)]:
+                self._size -= self._data.pop(k)[1]
+
+
+class VersionedCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, k: Hashable, version: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(k, None)
+        if entry is None or entry[0] != version:
+            return default
+        return entry[1]
+
+    def set(self, k: Hashable, v: Any, version: Hashable):
+        with self._lock:
+            self._data[k] = (version, v)
+
+    def prune(self, keep: Callable[[Hashable], bool]):
+        with self._lock:
+            for k in [x for x in self._data.keys() if not keep(x)]:
+                del self._data[k]
@@ -1,111 +1,336 @@
-from datetime import timedelta
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
 from logging import getLogger
+from typing import Dict, Iterator, Iterable, List, Mapping, Optional, Tuple
 
 import pytz
 from flask import Flask, request, Response
 
 from clickup_to_ical import __version__
+from clickup_to_ical import metrics
+from clickup_to_ical.description import description_text
 from clickup_to_ical.host import TRUE_VALUES
-from clickup_to_ical.web.stores import tasks, auth, default_event_length
-from clickup_to_ical.web.utils import ThreadingDict
+from clickup_to_ical.metrics import Timer
+from clickup_to_ical.web.compression import choose_encoding, compress, compress_stream
+from clickup_to_ical.web.stores import tenants, default_event_length, apply_webhook, resolve_auth, Tenant, \
+    DEFAULT_TENANT
+from clickup_to_ical.utils import LRUCache, VersionedCache
 
 _LOGGER = getLogger("clickup_to_ical")
 app = Flask(f"clickup_to_ical-{__version__}")
 _LOGGER.info(f"Creating flask app for clickup_to_ical-{__version__}")
 
+# Rendered calendars keyed on the tenant, the request parameters, the generation of the stores they were rendered from
+# and the content encoding. Calendars bigger than a quarter of the cache are only streamed and never cached.
+_CALENDAR_CACHE = LRUCache(max_size=int(os.environ.get("CALENDAR_CACHE_SIZE", 64)) * 1024 * 1024)
+_CALENDAR_CACHE_MAX_ENTRY = _CALENDAR_CACHE.max_size // 4
+# Part of the etag of calendars with random uids, those never match between processes or restarts
+_INSTANCE_ID = uuid.uuid4().hex
+default_event_length.subscribe(_CALENDAR_CACHE.clear)
+
+# Rendered events of every task, only dropped once a task is no longer part of the tasks of its tenant
+_EVENT_CACHE = VersionedCache()
+
+
+def _on_tenant_change(tenant: Tenant):
+    # A sync of one tenant leaves the calendars and events of all other tenants cached
+    def _changed():
+        _CALENDAR_CACHE.prune(keep=lambda k: k[0][0] != tenant.name)
+        index = tenant.tasks.get(None, None)
+        task_ids = set() if index is None else index.task_ids()
+        _EVENT_CACHE.prune(keep=lambda k: k[0] != tenant.name or k[1] in task_ids)
+    return _changed
+
+
+for _tenant in tenants.values():
+    _tenant.tasks.subscribe(_on_tenant_change(_tenant))
+
 
 @app.route("/api/1.0/calendar", methods=["GET"])
 def get_calendar():
-    import uuid
-    from clickup_to_ical.ical import Calendar, Event, User
-    from datetime import datetime
+    import hashlib
     request_from = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
     auth_key = request.headers.get("Authorization", request.args.get("token", None))
     if not auth_key:
         _LOGGER.info("Authorization token \"token\" missing from query arguments")
         _LOGGER.info("Authorization header \"Authorization\" missing from header")
         return "Unauthorized: No auth key provided in header", 401
-    clickup_user_id = auth.get(auth_key, None)
-    if clickup_user_id is None:
+    resolved = resolve_auth(auth_key)
+    if resolved is None:
         _LOGGER.info("Authorization in header not set in auth file")
         return "Unauthorized: Key not recognized", 401
+    tenant, clickup_user_id = resolved
 
+    # Everything below works on the snapshots taken here, even if new tasks get published in the meantime
+    task_snapshot, length_snapshot = tenant.tasks.snapshot, default_event_length.snapshot
+    generation = (task_snapshot.generation, length_snapshot.generation)
+    last_modified = datetime.fromtimestamp(max(task_snapshot.published, length_snapshot.published), tz=pytz.UTC)
     log = {"user id": clickup_user_id}
+    if len(tenants) > 1:
+        log["tenant"] = tenant.name
 
     date_types = request.args.get("date_types", None)
     if date_types is None:
         log["event types"] = "all"
-
-        def date_type_filter(_dt_name) -> bool:
-            return True
+        allowed_date_types = None
     else:
         allowed_date_types = [x.strip().lower() for x in date_types.split(",")]
         log["event types"] = "[" + ", ".join(f"\"{x}\"" for x in allowed_date_types) + "]"
 
-        def date_type_filter(_dt_name) -> bool:
-            return _dt_name.lower() in allowed_date_types
-
-    if request.args.get("only_assigned", "true").lower() in TRUE_VALUES:
-        log["assignees"] = clickup_user_id
-        assigned_tasks = tasks.get(clickup_user_id, [])
-    else:
-        log["assignees"] = "all"
-        assigned_tasks = tasks.get(None, [])
+    only_assigned = request.args.get("only_assigned", "true").lower() in TRUE_VALUES
+    log["assignees"] = clickup_user_id if only_assigned else "all"
 
     include_closed = request.args.get("include_closed", "false") in TRUE_VALUES
     log["closed included"] = include_closed
     fixed_uid = request.args.get("fixed_uid", "false") in TRUE_VALUES
     log["fixed uid"] = fixed_uid
 
+    try:
+        start, end = _time_window(request.args)
+    except (ValueError, OverflowError) as e:
+        # Days too far in the past or future overflow the datetime range
+        _LOGGER.info(f"Invalid time window: {e}")
+        return f"Bad Request: Invalid time window ({e})", 400
+    if start is not None or end is not None:
+        log["time window"] = " to ".join("-" if x is None else x.isoformat() for x in (start, end))
+
     _LOGGER.info(f"Request from {request_from}: <{'; '.join(f'{x}: {y}' for x, y in log.items())}>")
+
+    cache_key = (tenant.name, clickup_user_id, log["event types"], only_assigned, include_closed, fixed_uid, start, end,
+                 generation)
+    encoding = choose_encoding(request.accept_encodings)
+    timings = {}
+    with Timer(timings, "lookup"):
+        body = _CALENDAR_CACHE.get((cache_key, encoding), None)
+        plain = _CALENDAR_CACHE.get((cache_key, None), None) if body is None and encoding is not None else None
+    if plain is not None:
+        with Timer(timings, "compress"):
+            body = compress(plain, encoding=encoding)
+        _CALENDAR_CACHE.set((cache_key, encoding), body)
+    cached = body is not None
+    metrics.CALENDAR_CACHE.inc(result="hit" if cached else "miss")
+    if not cached:
+        # The calendar is deterministic for a cache key, so the etag is known before anything got rendered
+        render_timings = {}
+        body = _cache_stream((cache_key, None), (x.encode("utf-8") for x in _render_calendar(
+            tenant=tenant, task_data=task_snapshot.data, log=log, clickup_user_id=clickup_user_id,
+            only_assigned=only_assigned, date_types=allowed_date_types, include_closed=include_closed,
+            fixed_uid=fixed_uid, start=start, end=end, timings=render_timings,
+        )))
+        if encoding is not None:
+            body = _cache_stream((cache_key, encoding), compress_stream(body, encoding=encoding))
+        body = _observe_stream(body, timings=render_timings, encoding=encoding)
+    else:
+        metrics.CALENDAR_SIZE.observe(len(body), encoding=encoding or "identity")
+
+    response = Response(body, mimetype="text/calendar", status=200)
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    # The etag is derived from the content of the snapshots instead of their generation, so every worker and every
+    # restart answers with the same etag as long as the tasks did not change
+    task_index = task_snapshot.data.get(clickup_user_id if only_assigned else None, None)
+    etag = (__version__, cache_key[:-1], None if task_index is None else task_index.version,
+            sorted(length_snapshot.data.items()), encoding, None if fixed_uid else _INSTANCE_ID)
+    response.set_etag(hashlib.sha1(repr(etag).encode("utf-8")).hexdigest())
+    response.last_modified = last_modified
+    # The body of a cache miss is only rendered while it is sent, its phases only show up in /metrics
+    response.headers["Server-Timing"] = metrics.phase_header(
+        timings, cache="hit" if cached else "miss",
+        snapshot=f"age {max(0.0, datetime.now(tz=pytz.UTC).timestamp() - task_snapshot.published):.0f}s",
+    )
+    response = response.make_conditional(request)
+    metrics.CALENDAR_REQUESTS.inc(status=response.status_code)
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _parse_datetime(value: str) -> datetime:
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=pytz.UTC)
+
+
+def _time_window(args: Mapping) -> Tuple[Optional[datetime], Optional[datetime]]:
+    # Relative windows are aligned to days, so every request of a day shares the cache and the etag
+    today = datetime.now(tz=pytz.UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    start, end = None, None
+    if args.get("from", None):
+        start = _parse_datetime(args["from"])
+    elif args.get("past_days", None):
+        start = today - timedelta(days=int(args["past_days"]))
+    if args.get("to", None):
+        end = _parse_datetime(args["to"])
+    elif args.get("future_days", None):
+        end = today + timedelta(days=int(args["future_days"]) + 1)
+    if start is not None and end is not None and end < start:
+        raise ValueError("end of the window is before its start")
+    return start, end
+
+
+def _cache_stream(key: tuple, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    collected, size = [], 0
+    for chunk in chunks:
+        if collected is not None:
+            collected.append(chunk)
+            size += len(chunk)
+            if size > _CALENDAR_CACHE_MAX_ENTRY:
+                collected = None
+        yield chunk
+    if collected is not None:
+        _CALENDAR_CACHE.set(key, b"".join(collected))
+
+
+def _observe_stream(chunks: Iterable[bytes], timings: Dict[str, float], encoding: Optional[str]) -> Iterator[bytes]:
+    # Everything spent producing the body that is not filtering, markdown or building the events is serialisation
+    total, size = 0.0, 0
+    chunks = iter(chunks)
+    while True:
+        t1 = time.perf_counter()
+        chunk = next(chunks, None)
+        total += time.perf_counter() - t1
+        if chunk is None:
+            break
+        size += len(chunk)
+        yield chunk
+    timings["serialise"] = max(0.0, total - sum(timings.values()))
+    for phase, duration in timings.items():
+        metrics.CALENDAR_DURATION.observe(duration, phase=phase)
+    metrics.CALENDAR_SIZE.observe(size, encoding=encoding or "identity")
+
+
+def _render_calendar(tenant: Tenant, task_data: Mapping, log: dict, clickup_user_id, only_assigned: bool,
+                     date_types: Optional[List[str]], include_closed: bool, fixed_uid: bool,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     timings: Optional[Dict[str, float]] = None) -> Iterator[str]:
+    from clickup_to_ical.ical import Calendar
+    timings = {} if timings is None else timings
+
+    def _events():
+        task, events = None, None
+        hits, misses = 0, 0
+        filtered = iter(records)
+        while True:
+            with Timer(timings, "filter"):
+                record = next(filtered, None)
+            if record is None:
+                break
+            # Records of one task follow each other, so its events are only looked up once
+            if record.task is not task:
+                task = record.task
+                version = _task_version(task=task)
+                events = _EVENT_CACHE.get((tenant.name, task.id, fixed_uid), version=version)
+                if events is None:
+                    misses += 1
+                    events = _render_task_events(task=task, fixed_uid=fixed_uid, timings=timings)
+                    _EVENT_CACHE.set((tenant.name, task.id, fixed_uid), events, version=version)
+                else:
+                    hits += 1
+            event = events.get(record.name, None)
+            if event is None:
+                # The cached events do not match the records, render them again instead of failing the calendar
+                misses += 1
+                events = _render_task_events(task=task, fixed_uid=fixed_uid, timings=timings)
+                _EVENT_CACHE.set((tenant.name, task.id, fixed_uid), events, version=version)
+                event = events.get(record.name, None)
+            if event is not None:
+                yield event
+        metrics.EVENT_CACHE.inc(hits, result="hit")
+        metrics.EVENT_CACHE.inc(misses, result="miss")
+
+    task_index = task_data.get(clickup_user_id if only_assigned else None, None)
+    records = () if task_index is None else task_index.records(
+        date_types=date_types, include_closed=include_closed, start=start, end=end
+    )
     calendar = Calendar(
         version='2.0',
         prodid=f'-//CLICKUP-TO-ICAL-CONVERTER//github.com/RedRem95/clickup_to_ical//{__version__}//',
         calendar_name="ClickupToIcal Calendar",
         calendar_description="ClickupToIcal Calendar\n{}".format("\n".join(f"{x}: {y}" for x, y in log.items())),
-        calendar_ttl=None if tasks.frequency is None else timedelta(seconds=tasks.frequency)
+        calendar_ttl=timedelta(seconds=tenant.call_rate),
+        events=_events(),
     )
+    return calendar.iter_chunks()
+
+
+@app.route("/api/1.0/webhook", methods=["POST"])
+def post_webhook():
+    import hmac
+    import hashlib
+    tenant = tenants.get(request.args.get("tenant", DEFAULT_TENANT), None)
+    if tenant is None:
+        _LOGGER.info(f"Webhook received for unknown tenant {request.args.get('tenant', DEFAULT_TENANT)}")
+        return "Not Found: Unknown tenant", 404
+    secret = tenant.webhook_secret
+    if not secret:
+        _LOGGER.info(f"Webhook received but {tenant.name} has no webhook secret")
+        return "Forbidden: Webhooks not configured", 403
+    signature = hmac.new(secret.encode("utf-8"), request.get_data(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, request.headers.get("X-Signature", "")):
+        _LOGGER.info("Webhook signature does not match")
+        return "Unauthorized: Signature invalid", 401
+    event = request.get_json(silent=True)
+    if not isinstance(event, dict):
+        return "Bad Request: Body is not a webhook event", 400
+    apply_webhook(event=event, tenant=tenant.name)
+    return "", 200
+
+
+def _task_version(task) -> tuple:
+    # The rendered events of a task depend on the task, its parents, fields and members and the event lengths
+    from clickup_to_ical.index import render_version
+    return (default_event_length.generation,) + render_version(task)
+
+
+def _render_task_events(task, fixed_uid: bool, timings: Optional[Dict[str, float]] = None) -> Dict[str, str]:
+    timings = {} if timings is None else timings
+    with Timer(timings, "markdown"):
+        task_description = description_text(task.markdown_description)
+
+    with Timer(timings, "build"):
+        return _build_task_events(task=task, fixed_uid=fixed_uid, task_description=task_description)
+
+
+def _build_task_events(task, fixed_uid: bool, task_description: Optional[str]) -> Dict[str, str]:
+    from clickup_to_ical.ical import Event, User
+    members = task.get_member_index()
+
+    if task.creator in members and members[task.creator].email:
+        task_organizer = User(
+            uri=f"mailto:{members[task.creator].email}",
+            name=members[task.creator].username
+        )
+    else:
+        task_organizer = None
+
+    task_attendees = []
+    for assignee in task.get_assignees():
+        task_attendees.append(User(
+            uri=f"mailto:{assignee.email}",
+            name=assignee.username
+        ))
 
-    for task in (x for x in assigned_tasks if (include_closed or x.is_open())):
-        members = {x.id: x for x in task.get_members()}
-        if task.markdown_description is not None and len(task.markdown_description) > 0:
-            from markdown import markdown
-            from bs4 import BeautifulSoup
-            desc = BeautifulSoup(markdown(task.markdown_description), features='html.parser').get_text()
-            task_description = desc
-        else:
-            task_description = None
-
-        if task.creator in members and members[task.creator].email:
-            task_organizer = User(
-                uri=f"mailto:{members[task.creator].email}",
-                name=members[task.creator].username
-            )
-        else:
-            task_organizer = None
-
-        task_attendees = []
-        for assignee in task.get_assignees():
-            task_attendees.append(User(
-                uri=f"mailto:{assignee.email}",
-                name=assignee.username
-            ))
-
-        for dt_name, dt in ((x, y) for x, y in task.get_all_dates().items() if date_type_filter(_dt_name=x)):
-            real_name = dt_name[2 if dt_name.startswith('__') else 0:]
-            uid = uuid.uuid3(uuid.NAMESPACE_X500, f"{task.id}-{dt_name}") if fixed_uid else uuid.uuid4()
-            event = Event(
-                uid=str(uid),
-                dtstamp=datetime.fromtimestamp(float(task.date_created) / 1000, tz=pytz.UTC),
-                url=task.url,
-                summary=f"{task.get_name()} - {real_name}",
-                dtstart=dt,
-                dtend=dt + timedelta(seconds=default_event_length.get(real_name, 0)),
-                priority=task.priority,
-                organizer=task_organizer,
-                attendees=task_attendees,
-                description=task_description,
-            )
-            calendar.events.append(event)
-
-    return Response(str(calendar), mimetype="text/calendar", status=200)
+    events = {}
+    for dt_name, dt in task.get_all_dates().items():
+        real_name = dt_name[2 if dt_name.startswith('__') else 0:]
+        # Random uids are created once per version of a task and stay the same while the rendered event is cached
+        uid = uuid.uuid3(uuid.NAMESPACE_X500, f"{task.id}-{dt_name}") if fixed_uid else uuid.uuid4()
+        event = Event(
+            uid=str(uid),
+            dtstamp=datetime.fromtimestamp(float(task.date_created) / 1000, tz=pytz.UTC),
+            url=task.url,
+            summary=f"{task.get_name()} - {real_name}",
+            dtstart=dt,
+            dtend=dt + timedelta(seconds=default_event_length.get(real_name, 0)),
+            priority=task.priority,
+            organizer=task_organizer,
+            attendees=task_attendees,
+            description=task_description,
+        )
+        events[dt_name] = event.to_ical()
+    return events
@@ -0,0 +1,79 @@
+import os
+import zlib
+from typing import Iterator, Optional, Iterable
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_GZIP_LEVEL = int(os.environ.get("CALENDAR_GZIP_LEVEL", 6))
+_BROTLI_LEVEL = int(os.environ.get("CALENDAR_BROTLI_LEVEL", 5))
+_ZSTD_LEVEL = int(os.environ.get("CALENDAR_ZSTD_LEVEL", 3))
+
+
+class _GzipCompressor:
+    def __init__(self):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._obj = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=_BROTLI_LEVEL)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+# Ordered by preference if a client accepts several encodings with the same quality
+_COMPRESSORS = {"gzip": _GzipCompressor}
+if zstandard is not None:
+    _COMPRESSORS = {"zstd": _ZstdCompressor, **_COMPRESSORS}
+if brotli is not None:
+    _COMPRESSORS = {"br": _BrotliCompressor, **_COMPRESSORS}
+
+ENCODINGS = tuple(_COMPRESSORS.keys())
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    return accept_encodings.best_match(ENCODINGS, default=None)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = _COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = _COMPRESSORS[encoding]()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if len(data) > 0:
+            yield data
+    yield compressor.flush()
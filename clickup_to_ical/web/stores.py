@@ -1,11 +1,19 @@
 import os
+import threading
 from logging import getLogger
+from typing import Dict, Optional, Set, Tuple
 
+from clickup_to_ical.clickup import Client, Scope
+from clickup_to_ical.clickup.sync import TaskSync
 from clickup_to_ical.host import TRUE_VALUES
-from clickup_to_ical.web.utils import ThreadingDict
+from clickup_to_ical.utils import Scheduler, SnapshotDict
+from clickup_to_ical.index import TaskIndex, build_indexes, task_records
 
 _LOGGER = getLogger("clickup_to_ical")
 
+# Name of the only tenant if no TENANTS_FILE is given, it is configured by the environment variables
+DEFAULT_TENANT = "default"
+
 
 def _update_auth():
     import json
@@ -16,7 +24,7 @@ def _update_auth():
     return None
 
 
-auth = ThreadingDict(auto_update=(_update_auth, 60 * 5))
+auth = SnapshotDict(auto_update=(_update_auth, 60 * 5))
 
 
 def _update_default_length():
@@ -29,28 +37,274 @@ def _update_default_length():
         return {}
 
 
-default_event_length = ThreadingDict(auto_update=(_update_default_length, 60 * 5))
+default_event_length = SnapshotDict(auto_update=(_update_default_length, 60 * 5))
+
+
+# With TASK_SOURCE=snapshot the tasks are only read from SNAPSHOT_FILE and with TASK_SOURCE=shared from
+# SHARED_SNAPSHOT_FILE, another process keeps the file up to date
+_TASK_SOURCE = os.environ.get("TASK_SOURCE", "clickup").lower()
+_READ_SNAPSHOT = _TASK_SOURCE in ("snapshot", "shared")
+CALL_RATE = int(os.environ.get("CLICKUP_CALL_RATE", 60 * 15))
+# The syncs of all tenants share these workers
+_SCHEDULER = Scheduler(workers=int(os.environ.get("TENANT_WORKERS", 2)))
+
+
+def _tenant_path(variable: str, name: str, configured: Optional[str]) -> Optional[str]:
+    # Tenants without a path of their own get one next to the path of the environment variable
+    if configured is not None:
+        return configured
+    if variable not in os.environ:
+        return None
+    if name == DEFAULT_TENANT:
+        return os.environ[variable]
+    root, ext = os.path.splitext(os.environ[variable])
+    if ext == ".gz":
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return f"{root}-{name}{ext}"
+
+
+class Tenant:
+    # One Clickup workspace with its own api key, rate budget, sync schedule and snapshot
+    def __init__(self, name: str, api_key: Optional[str] = None, rate_limit: Optional[int] = None,
+                 call_rate: int = CALL_RATE, full_sync_rate: Optional[int] = None, with_subtasks: bool = False,
+                 with_closed: bool = False, workers: Optional[int] = None, snapshot_file: Optional[str] = None,
+                 shared_snapshot_file: Optional[str] = None, webhook_secret: Optional[str] = None,
+                 scope: Optional[Scope] = None, hierarchy_rate: Optional[int] = None):
+        self.name = name
+        self.call_rate = call_rate
+        self.webhook_secret = webhook_secret
+        self.snapshot_file = _tenant_path("SNAPSHOT_FILE", name=name, configured=snapshot_file)
+        self.shared_snapshot_file = _tenant_path("SHARED_SNAPSHOT_FILE", name=name, configured=shared_snapshot_file)
+        self._snapshot_mtime = None
+        # Webhooks change the indexes they read, concurrent ones would overwrite each other's changes
+        self._webhook_lock = threading.Lock()
+        self.sync = TaskSync(
+            with_closed=with_closed, with_subtasks=with_subtasks, full_sync_rate=full_sync_rate, scope=scope,
+            hierarchy_rate=hierarchy_rate,
+            client=Client(api_key=api_key, rate_limit=rate_limit, workers=workers, name=name),
+        )
+        if _READ_SNAPSHOT:
+            path = self.shared_snapshot_file if _TASK_SOURCE == "shared" else self.snapshot_file
+            if path is None:
+                _variable = "SHARED_SNAPSHOT_FILE" if _TASK_SOURCE == "shared" else "SNAPSHOT_FILE"
+                raise RuntimeError(f"TASK_SOURCE={_TASK_SOURCE} needs {_variable} to be set")
+            self.tasks = SnapshotDict(auto_update=(self._reload_tasks, int(os.environ.get("SNAPSHOT_POLL_RATE", 5))),
+                                      initial=self._reload_tasks(), scheduler=_SCHEDULER, tenant=name)
+        else:
+            self.tasks = SnapshotDict(auto_update=(self._update_tasks, call_rate), initial=self._load_tasks(),
+                                      scheduler=_SCHEDULER, tenant=name)
+            if len(self.tasks.snapshot.data) > 0:
+                self._save_shared(indexes=self.tasks.snapshot.data)
+        self.tasks.subscribe(self._observe_snapshot)
+        self._observe_snapshot()
+
+    @classmethod
+    def from_json(cls, name: str, json_data: dict) -> "Tenant":
+        return cls(
+            name=name,
+            api_key=json_data["api_key"],
+            rate_limit=json_data.get("rate_limit", None),
+            call_rate=int(json_data.get("call_rate", CALL_RATE)),
+            full_sync_rate=json_data.get("full_sync_rate", None),
+            with_subtasks=json_data.get("subtasks", False),
+            with_closed=json_data.get("closed", False),
+            workers=json_data.get("workers", None),
+            snapshot_file=json_data.get("snapshot_file", None),
+            shared_snapshot_file=json_data.get("shared_snapshot_file", None),
+            webhook_secret=json_data.get("webhook_secret", None),
+            scope=Scope.from_json(json_data.get("scope", None)),
+            hierarchy_rate=json_data.get("hierarchy_rate", None),
+        )
+
+    def _update_tasks(self):
+        from time import perf_counter, time
+        from datetime import timedelta
+        from clickup_to_ical.metrics import SYNC_DURATION, SYNC_LAST_SUCCESS
+        full_sync = self.sync.needs_full_sync()
+        _LOGGER.debug(f"Updating tasks of {self.name} ({'full' if full_sync else 'delta'} sync)")
+        calls1, api_time1 = self.sync.client.stats()
+        t1 = perf_counter()
+        _tasks = self.sync.full_sync() if full_sync else self.sync.delta_sync()
+        t2 = perf_counter()
+        calls2, api_time2 = self.sync.client.stats()
+        speed_up = (api_time2 - api_time1) / (t2 - t1) if t2 > t1 else 1
+        _LOGGER.info(f"Found {len(_tasks)} tasks of {self.name} in {timedelta(seconds=t2 - t1)} "
+                     f"({'full' if full_sync else 'delta'} sync, {calls2 - calls1} api calls taking "
+                     f"{timedelta(seconds=api_time2 - api_time1)}, {speed_up:.2f}x speed-up)")
+        SYNC_DURATION.observe(t2 - t1, type="full" if full_sync else "delta", tenant=self.name)
+        SYNC_LAST_SUCCESS.set(time(), tenant=self.name)
+        indexes = build_indexes(_tasks)
+        self.save_tasks(indexes=indexes)
+        return indexes
+
+    def save_tasks(self, indexes: dict = None):
+        if self.snapshot_file is not None:
+            try:
+                self.sync.save(path=self.snapshot_file)
+            except Exception:
+                _LOGGER.exception(f"Failed to save snapshot to {self.snapshot_file}")
+        self._save_shared(indexes=self.tasks.snapshot.data if indexes is None else indexes)
+
+    def _save_shared(self, indexes: dict):
+        if self.shared_snapshot_file is not None:
+            from clickup_to_ical.shared import save_shared_snapshot
+            # The tasks come from the indexes, so every record in the file points to a task in the file
+            _tasks = list(indexes.get(None, ()))
+            lists = {x.id: x for x in self.sync.lists}
+            lists.update({x.lst.id: x.lst for x in _tasks})
+            try:
+                save_shared_snapshot(path=self.shared_snapshot_file, teams=self.sync.teams,
+                                     lists=list(lists.values()), tasks=_tasks, indexes=indexes)
+            except Exception:
+                _LOGGER.exception(f"Failed to save shared snapshot to {self.shared_snapshot_file}")
+
+    def _load_tasks(self):
+        from time import perf_counter
+        from datetime import timedelta
+        if self.snapshot_file is None:
+            return None
+        t1 = perf_counter()
+        _tasks = self.sync.load(path=self.snapshot_file)
+        t2 = perf_counter()
+        if _tasks is None:
+            return None
+        _LOGGER.info(f"Loaded {len(_tasks)} tasks of {self.name} from {self.snapshot_file} in "
+                     f"{timedelta(seconds=t2 - t1)}")
+        return build_indexes(_tasks)
+
+    def _reload_tasks(self):
+        path = self.shared_snapshot_file if _TASK_SOURCE == "shared" else self.snapshot_file
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._snapshot_mtime:
+            return None
+        # The file is only skipped once it was loaded, a failed load is tried again with the next poll
+        if _TASK_SOURCE == "shared":
+            from time import perf_counter
+            from datetime import timedelta
+            from clickup_to_ical.shared import SharedSnapshot
+            t1 = perf_counter()
+            snapshot = SharedSnapshot(path)
+            t2 = perf_counter()
+            _LOGGER.info(f"Mapped {snapshot.task_count} tasks of {self.name} from {path} in "
+                         f"{timedelta(seconds=t2 - t1)}")
+            self._snapshot_mtime = mtime
+            return snapshot.indexes
+        indexes = self._load_tasks()
+        if indexes is not None:
+            self._snapshot_mtime = mtime
+        return indexes
+
+    def _observe_snapshot(self):
+        from clickup_to_ical.metrics import SNAPSHOT_SIZE
+        data = self.tasks.snapshot.data
+        everyone = data.get(None, None)
+        SNAPSHOT_SIZE.set(0 if everyone is None else len(everyone), kind="tasks", tenant=self.name)
+        SNAPSHOT_SIZE.set(len([x for x in data.keys() if x is not None]), kind="users", tenant=self.name)
+        SNAPSHOT_SIZE.set(0 if everyone is None else everyone.event_count(), kind="events", tenant=self.name)
+
+    @staticmethod
+    def _dependent_assignees(task_id: str, index: TaskIndex) -> Set[int]:
+        from clickup_to_ical.clickup import Task
+        assignees = set()
+        for task in index:
+            parent = task.parent
+            while isinstance(parent, Task) and parent.id != task_id:
+                parent = parent.parent
+            if isinstance(parent, Task) or parent == task_id:
+                assignees.update(task.assignees)
+        return assignees
+
+    def apply_webhook(self, event: dict) -> bool:
+        event_name = event.get("event", "")
+        task_id = event.get("task_id", None)
+        if task_id is None or not event_name.startswith("task"):
+            _LOGGER.debug(f"Ignoring webhook event {event_name}")
+            return False
+        if _READ_SNAPSHOT:
+            # Only the process writing the snapshot talks to the Clickup API, readers see the change with the next
+            # snapshot
+            from clickup_to_ical.server import forward_webhook
+            return forward_webhook(event=event, tenant=self.name)
+        with self._webhook_lock:
+            return self._apply_webhook(event_name=event_name, task_id=task_id)
+
+    def _apply_webhook(self, event_name: str, task_id: str) -> bool:
+        if event_name == "taskDeleted":
+            old, new = self.sync.remove_task(task_id=task_id), None
+        else:
+            old, new = self.sync.refresh_task(task_id=task_id)
+        _LOGGER.info(f"Webhook {event_name} for task {task_id} of {self.name}")
+
+        # Only the entries of users assigned before or after the change have to be indexed again
+        affected = {None}
+        for _task in (old, new):
+            if _task is not None:
+                affected.update(_task.assignees)
+        entry = None if new is None else (new, task_records(new))
+        changes = {}
+        for k in affected:
+            keep = new is not None and (k is None or k in new.assignees)
+            changes[k] = self.tasks.get(k, TaskIndex(())).replace(task_id=task_id, entry=entry if keep else None)
+        # Subtasks render the name of the changed task, the indexes of their assignees need a new version as well
+        for k in self._dependent_assignees(task_id=task_id, index=changes[None]) - changes.keys():
+            index = self.tasks.get(k, None)
+            if index is not None:
+                changes[k] = TaskIndex(index.entries)
+        self.tasks.update(changes)
+        return True
+
+
+def _load_tenants() -> Dict[str, Tenant]:
+    import json
+    if "TENANTS_FILE" not in os.environ:
+        return {DEFAULT_TENANT: Tenant(
+            name=DEFAULT_TENANT,
+            with_closed=os.environ.get("TASKS_CLOSED", "") in TRUE_VALUES,
+            with_subtasks=os.environ.get("TASKS_SUBTASKS", "") in TRUE_VALUES,
+            full_sync_rate=int(os.environ["CLICKUP_FULL_SYNC_RATE"]) if "CLICKUP_FULL_SYNC_RATE" in os.environ
+            else None,
+            webhook_secret=os.environ.get("CLICKUP_WEBHOOK_SECRET", None),
+            scope=Scope.from_env(),
+            hierarchy_rate=int(os.environ["CLICKUP_HIERARCHY_RATE"]) if "CLICKUP_HIERARCHY_RATE" in os.environ
+            else None,
+        )}
+    with open(os.environ["TENANTS_FILE"], "r") as f_in:
+        config = json.load(f_in)
+    _LOGGER.info(f"Serving {len(config)} tenants: {', '.join(config.keys())}")
+    return {name: Tenant.from_json(name=name, json_data=x) for name, x in config.items()}
+
+
+tenants = _load_tenants()
+
+
+def resolve_auth(auth_key: str) -> Optional[Tuple[Tenant, str]]:
+    # Tokens map to a user id of the default tenant or to {"tenant": ..., "user": ...}
+    entry = auth.get(auth_key, None)
+    if entry is None:
+        return None
+    if isinstance(entry, dict):
+        tenant, user = tenants.get(entry.get("tenant", DEFAULT_TENANT), None), entry.get("user", None)
+    else:
+        tenant, user = tenants.get(DEFAULT_TENANT, None), entry
+    if tenant is None or user is None:
+        return None
+    # Clickup user ids are numbers, auth files usually hold them as strings
+    if isinstance(user, str) and user.strip().isdigit():
+        user = int(user)
+    return tenant, user
 
 
-def _update_tasks():
-    from time import perf_counter
-    from datetime import timedelta
-    from clickup_to_ical.clickup import get_tasks_all
-    from collections import defaultdict
-    _LOGGER.debug("Updating tasks")
-    t1 = perf_counter()
-    _tasks = get_tasks_all(
-        with_closed=os.environ.get("TASKS_CLOSED", "") in TRUE_VALUES,
-        with_subtasks=os.environ.get("TASKS_SUBTASKS", "") in TRUE_VALUES,
-    )
-    t2 = perf_counter()
-    _LOGGER.info(f"Found {len(_tasks)} tasks in {timedelta(seconds=t2 - t1)}")
-    d = defaultdict(list)
-    for _task in _tasks:
-        d[None].append(_task)
-        for _assignee in _task.assignees:
-            d[_assignee].append(_task)
-    return {k: tuple(v) for k, v in d.items()}
+def save_tasks(tenant: Optional[str] = None):
+    for _tenant in tenants.values() if tenant is None else (tenants[tenant],):
+        _tenant.save_tasks()
 
 
-tasks = ThreadingDict(auto_update=(_update_tasks, int(os.environ.get("CLICKUP_CALL_RATE", 60 * 15))))
+def apply_webhook(event: dict, tenant: str = DEFAULT_TENANT) -> bool:
+    if tenant not in tenants:
+        _LOGGER.info(f"Ignoring webhook for unknown tenant {tenant}")
+        return False
+    return tenants[tenant].apply_webhook(event=event)
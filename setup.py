@@ -27,12 +27,18 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'Clickup_Explore = clickup_to_ical.explore:main',
-            'Clickup_To_iCal = clickup_to_ical.host:main'
+            'Clickup_To_iCal = clickup_to_ical.host:main',
+            'Clickup_Benchmark = clickup_to_ical.benchmark:main',
         ],
     },
     packages=setuptools.find_packages(include=['clickup_to_ical', 'clickup_to_ical.*']),
     python_requires=">=3.7",
     install_requires=["requests", "pytz", "Flask", "requests-ratelimiter", "markdown", "beautifulsoup4"],
+    extras_require={
+        "compression": ["brotli", "zstandard"],
+        "server": ["gunicorn"],
+        "json": ["msgspec"],
+    },
     include_package_data=True,
     zip_safe=False,
 )
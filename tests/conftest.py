@@ -0,0 +1,71 @@
+import json
+import os
+import socket
+import tempfile
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# The api url and the tenants are read on import, so they have to be set before anything of clickup_to_ical is imported
+_PORT = _free_port()
+_DIRECTORY = tempfile.mkdtemp(prefix="clickup_to_ical-tests-")
+TENANT = "test"
+# Same workspace, synced with subtasks
+SUBTASK_TENANT = "subtasks"
+WEBHOOK_SECRET = "secret"
+TOKEN = "token"
+with open(os.path.join(_DIRECTORY, "auth.json"), "w") as f_out:
+    json.dump({TOKEN: {"tenant": TENANT, "user": "1000"}}, f_out)
+with open(os.path.join(_DIRECTORY, "tenants.json"), "w") as f_out:
+    json.dump({
+        TENANT: {"api_key": "test", "rate_limit": 6000, "call_rate": 3600, "workers": 2,
+                 "webhook_secret": WEBHOOK_SECRET},
+        SUBTASK_TENANT: {"api_key": "test", "rate_limit": 6000, "call_rate": 3600, "workers": 2, "subtasks": True,
+                         "webhook_secret": WEBHOOK_SECRET},
+    }, f_out)
+os.environ.update({
+    "CLICKUP_API_URL": f"http://127.0.0.1:{_PORT}/api/v2",
+    "TENANTS_FILE": os.path.join(_DIRECTORY, "tenants.json"),
+    "AUTH_FILE": os.path.join(_DIRECTORY, "auth.json"),
+    "TASK_SOURCE": "clickup",
+    "CLICKUP_RETRIES": "0",
+})
+for _variable in ("CLICKUP_API_KEY", "SNAPSHOT_FILE", "SHARED_SNAPSHOT_FILE", "SCOPE_FILE", "DEFAULT_LENGTH"):
+    os.environ.pop(_variable, None)
+
+from clickup_to_ical.benchmark.fake_api import FakeClickup  # noqa: E402
+
+FAKE_API = FakeClickup(lists=4, tasks=200, description=50, latency=0.0)
+_SERVER = FAKE_API.serve(port=_PORT)
+
+
+@pytest.fixture(scope="session")
+def fake_api() -> FakeClickup:
+    return FAKE_API
+
+
+def _synced_tenant(name: str):
+    import time
+    from clickup_to_ical.web import stores
+    tenant = stores.tenants[name]
+    # The first sync is scheduled on import, the next one only after the call rate
+    deadline = time.time() + 30
+    while tenant.tasks.generation <= 0 and time.time() < deadline:
+        time.sleep(0.05)
+    return tenant
+
+
+@pytest.fixture(scope="session")
+def tenant(fake_api):
+    return _synced_tenant(TENANT)
+
+
+@pytest.fixture(scope="session")
+def subtask_tenant(fake_api):
+    return _synced_tenant(SUBTASK_TENANT)
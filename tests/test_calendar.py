@@ -0,0 +1,94 @@
+import pytest
+
+from conftest import TOKEN
+
+
+@pytest.fixture()
+def client(tenant):
+    from clickup_to_ical.web import app
+    return app.test_client()
+
+
+def test_calendar(client):
+    response = client.get(f"/api/1.0/calendar?token={TOKEN}&only_assigned=false")
+    assert response.status_code == 200
+    assert response.data.startswith(b"BEGIN:VCALENDAR")
+
+
+@pytest.mark.parametrize("query", ["past_days=10000000", "future_days=10000000", "past_days=10000000000000",
+                                   "future_days=abc", "from=2024-02-01&to=2024-01-01"])
+def test_invalid_time_window(client, query):
+    response = client.get(f"/api/1.0/calendar?token={TOKEN}&{query}")
+    assert response.status_code == 400
+
+
+def test_unchanged_sync_keeps_etag(client, tenant):
+    tenant.tasks.set(tenant._update_tasks())
+    url = f"/api/1.0/calendar?token={TOKEN}&only_assigned=false&fixed_uid=true"
+    first = client.get(url)
+    generation = tenant.tasks.generation
+    # A poll that returns the same tasks does not publish new ones, a fresh index of them has the same etag
+    tenant.tasks.set(tenant._update_tasks())
+    assert tenant.tasks.generation == generation
+    tenant.tasks.update({k: type(v)(v.entries) for k, v in tenant.tasks.snapshot.data.items()})
+    second = client.get(url)
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_renamed_date_field(client, tenant, fake_api):
+    url = f"/api/1.0/calendar?token={TOKEN}&only_assigned=false&fixed_uid=true"
+    tenant.tasks.set(tenant._update_tasks())
+    assert b"Date 0" in client.get(url).data
+    # Renaming a custom field does not change date_updated of the tasks using it
+    fields = [x for task in fake_api.task_index.values() for x in task["custom_fields"] if x["name"] == "Date 0"]
+    try:
+        for field in fields:
+            field["name"] = "Deadline"
+        tenant.tasks.set(tenant._update_tasks())
+        response = client.get(url)
+        assert response.status_code == 200
+        assert b"Deadline" in response.data and b"Date 0" not in response.data
+    finally:
+        for field in fields:
+            field["name"] = "Date 0"
+        tenant.tasks.set(tenant._update_tasks())
+
+
+def test_renamed_member(client, tenant, fake_api):
+    url = f"/api/1.0/calendar?token={TOKEN}&only_assigned=false&fixed_uid=true"
+    tenant.tasks.set(tenant._update_tasks())
+    client.get(url)
+    member = fake_api.teams[0]["members"][0]["user"]
+    username = member["username"]
+    try:
+        member["username"] = "Renamed member"
+        tenant.tasks.set(tenant._update_tasks())
+        assert b"CN=Renamed member" in client.get(url).data
+    finally:
+        member["username"] = username
+        tenant.tasks.set(tenant._update_tasks())
+
+
+def test_only_assigned(client, tenant):
+    tenant.tasks.set(tenant._update_tasks())
+    index = tenant.tasks.snapshot.data[1000]
+    response = client.get(f"/api/1.0/calendar?token={TOKEN}&fixed_uid=true")
+    assert response.status_code == 200
+    everyone = client.get(f"/api/1.0/calendar?token={TOKEN}&only_assigned=false&fixed_uid=true")
+    assigned = response.data.count(b"BEGIN:VEVENT")
+    assert assigned == index.event_count() > 0
+    assert assigned < everyone.data.count(b"BEGIN:VEVENT")
+    for task_id in index.task_ids():
+        assert task_id.encode("utf-8") in response.data
+
+
+def test_compression(client):
+    import gzip
+    url = f"/api/1.0/calendar?token={TOKEN}&only_assigned=false&fixed_uid=true"
+    identity = client.get(url)
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"] != identity.headers["ETag"]
+    assert gzip.decompress(response.data) == identity.data
@@ -0,0 +1,79 @@
+import pytest
+
+
+@pytest.fixture()
+def client(fake_api):
+    from clickup_to_ical.clickup import Client
+    return Client(api_key="test", rate_limit=6000, workers=2, name="crawl")
+
+
+def test_malformed_page_fails_only_its_list(client, fake_api):
+    from clickup_to_ical.clickup import decode, get_all
+    if decode.BACKEND != "msgspec":
+        pytest.skip("Only msgspec validates the records of a page")
+    list_id = next(iter(fake_api.tasks))
+    task = fake_api.tasks[list_id][0]
+    name = task["name"]
+    task["name"] = 5
+    try:
+        failed = []
+        _, lists, tasks = get_all(with_subtasks=True, with_closed=True, failed=failed, client=client)
+        assert [x.id for x in failed] == [list_id]
+        assert len(tasks) > 0 and all(x.lst.id != list_id for x in tasks)
+        with pytest.raises(decode.DECODE_ERRORS):
+            get_all(with_subtasks=True, with_closed=True, client=client)
+    finally:
+        task["name"] = name
+
+
+def test_retries(client, fake_api, monkeypatch):
+    from clickup_to_ical import clickup
+    monkeypatch.setattr(clickup, "_RETRIES", 10)
+    monkeypatch.setattr(clickup, "_BACKOFF", 0.0)
+    errors = fake_api.stats["errors"]
+    fake_api.errors = 0.2
+    try:
+        _, _, tasks = clickup.get_all(with_subtasks=True, with_closed=True, client=client)
+    finally:
+        fake_api.errors = 0.0
+    assert fake_api.stats["errors"] > errors
+    assert {x.id for x in tasks} == set(fake_api.task_index)
+
+
+def test_scope(client, fake_api):
+    from clickup_to_ical.clickup import get_all
+    from clickup_to_ical.clickup.scope import Scope
+    list_ids = list(fake_api.tasks)
+    _, lists, tasks = get_all(with_subtasks=True, with_closed=True, client=client,
+                              scope=Scope.from_json({"lists": {"include": list_ids[:2]}}))
+    assert {x.id for x in lists} == set(list_ids[:2])
+    assert {x.id for x in tasks} == {x["id"] for list_id in list_ids[:2] for x in fake_api.tasks[list_id]}
+    # Names match as case insensitive glob patterns
+    _, lists, tasks = get_all(with_subtasks=True, with_closed=True, client=client,
+                              scope=Scope.from_json({"lists": {"exclude": [f"LIST {list_ids[0]}"]}}))
+    assert {x.id for x in lists} == set(list_ids[1:])
+    assert len(tasks) > 0 and all(x.lst.id != list_ids[0] for x in tasks)
+
+
+def test_delta_sync(client, fake_api):
+    from clickup_to_ical.clickup.sync import TaskSync
+    sync = TaskSync(with_subtasks=True, with_closed=True, full_sync_rate=3600, client=client)
+    assert sync.needs_full_sync()
+    requests = fake_api.stats["requests"]
+    tasks = sync.full_sync()
+    full_sync_requests = fake_api.stats["requests"] - requests
+    assert not sync.needs_full_sync()
+    task = fake_api.task_index[tasks[0].id]
+    name, date_updated = task["name"], task["date_updated"]
+    try:
+        task["name"] = "Changed since the full sync"
+        task["date_updated"] = str(sync.date_updated + 10 * 60 * 1000)
+        requests = fake_api.stats["requests"]
+        synced = {x.id: x for x in sync.sync()}
+        # Only the tasks of the team updated since the last sync are requested, not every list
+        assert fake_api.stats["requests"] - requests < full_sync_requests
+        assert synced[task["id"]].name == "Changed since the full sync"
+        assert synced.keys() == {x.id for x in tasks}
+        assert sync.date_updated == int(task["date_updated"])
+    finally:
+        task["name"], task["date_updated"] = name, date_updated
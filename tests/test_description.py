@@ -0,0 +1,51 @@
+import pytest
+
+from clickup_to_ical.description import description_text, markdown_to_text
+
+
+def test_code_blocks_stay_as_they_are():
+    text = "Text *with* **inline** `syntax` &amp;\n```\ncode block *not* &amp; [a](b)\n```\nAfter ~~the~~ block"
+    assert markdown_to_text(text) == "Text with inline syntax &\ncode block *not* &amp; [a](b)\nAfter the block"
+
+
+def test_unclosed_code_block():
+    assert markdown_to_text("Text *with*\n~~~\ncode *not*") == "Text with\ncode *not*"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("# Heading #\n\n- [x] done\n1. first", "Heading\n\ndone\nfirst"),
+    ("> quoted [link](https://example.com) ![image](a.png)", "quoted link image"),
+    ("snake_case and 2*3*4 stay, \\*escaped\\*", "snake_case and 2*3*4 stay, *escaped*"),
+    ("a\n\n---\n\n\n\nb", "a\n\nb"),
+    ("<b>html</b> &lt;kept&gt;", "html <kept>"),
+])
+def test_markdown_to_text(text, expected):
+    assert markdown_to_text(text) == expected
+
+
+def test_description_text():
+    assert description_text(None) is None
+    assert description_text("") is None
+    assert description_text("**Bold**") == "Bold"
+
+
+@pytest.mark.parametrize("text", [
+    "Plain text",
+    "# Heading\n\nSome **bold** and *emphasis*",
+    "- first\n- [link](https://example.com)\n- `code`",
+    "> quoted\n\n1. one\n2. two",
+])
+def test_same_text_as_markdown(text):
+    pytest.importorskip("markdown")
+    pytest.importorskip("bs4")
+    # Only blank lines differ, the fast converter keeps the paragraphs of the markdown
+    def lines(value):
+        return [x for x in value.splitlines() if len(x.strip()) > 0]
+    assert lines(markdown_to_text(text)) == lines(markdown_to_text(text, converter="markdown"))
+
+
+def test_truncated(monkeypatch):
+    from clickup_to_ical import description
+    monkeypatch.setattr(description, "_MAX_LENGTH", 20)
+    text = description_text("**word** " * 10 + "unique")
+    assert text == "word word word…"
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+from clickup_to_ical.ical import Calendar, Event, User
+
+_GOLDEN = "\r\n".join([
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "PRODID:-//test//",
+    "X-WR-CALNAME:Test",
+    "X-PUBLISHED-TTL:PT15M",
+    "BEGIN:VEVENT",
+    "UID:task-1",
+    "DTSTAMP:20240101T000000Z",
+    "DTSTART:20240102T093000Z",
+    "DTEND:20240102T100000Z",
+    "URL:https://app.clickup.com/t/1",
+    "SUMMARY:Parent -> Task\\; with\\, special\\\\chars - Due Date",
+    "DESCRIPTION:Line one\\nLine two\\nLine three xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",
+    " xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",
+    "PRIORITY:2",
+    "ORGANIZER;CN=\"Ann; Admin\":mailto:a@example.com",
+    "ATTENDEE;CN=Bob:mailto:b@example.com",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:task-2",
+    "DTSTAMP:20240101T000000Z",
+    "DTSTART:20240103T000000Z",
+    "SUMMARY:Größe €€€€€€€€€€€€€€€€€€€",
+    " €€€€€€€€€€€€€€€€€€€€€",
+    "END:VEVENT",
+    "END:VCALENDAR",
+])
+
+
+def _calendar(events) -> Calendar:
+    return Calendar(version="2.0", prodid="-//test//", calendar_name="Test", calendar_ttl=timedelta(minutes=15),
+                    events=events)
+
+
+def _events():
+    day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        Event(uid="task-1", dtstamp=day, dtstart=day + timedelta(days=1, hours=9, minutes=30),
+              dtend=day + timedelta(days=1, hours=10), url="https://app.clickup.com/t/1",
+              summary="Parent -> Task; with, special\\chars - Due Date",
+              description="Line one\nLine two\r\nLine three " + "x" * 100, priority=2,
+              organizer=User(uri="mailto:a@example.com", name="Ann; Admin"),
+              attendees=[User(uri="mailto:b@example.com", name="Bob")]),
+        # Three octets per euro sign, the fold falls into the middle of one
+        Event(uid="task-2", dtstamp=day, dtstart=day + timedelta(days=2), summary="Größe " + "€" * 40),
+    ]
+
+
+def test_golden():
+    assert str(_calendar(_events())) == _GOLDEN
+
+
+def test_golden_streamed_and_prerendered():
+    assert "".join(_calendar(_events()).iter_chunks()) == _GOLDEN
+    assert str(_calendar([x.to_ical() for x in _events()])) == _GOLDEN
+
+
+def test_folding():
+    text = str(_calendar(_events()))
+    for line in text.split("\r\n"):
+        assert len(line.encode("utf-8")) <= 75
+
+
+def test_legacy_writer():
+    from clickup_to_ical.benchmark.render import check_golden
+    assert check_golden()
@@ -0,0 +1,42 @@
+import logging
+import multiprocessing
+import threading
+import time
+
+
+def _exit():
+    pass
+
+
+def _sleep():
+    time.sleep(5)
+
+
+def test_dead_fetcher_is_restarted(monkeypatch, caplog):
+    from clickup_to_ical import server
+    monkeypatch.setattr(server, "_RESTART_DELAY", 0)
+    stopping = threading.Event()
+    monkeypatch.setattr(server, "_STOPPING", stopping)
+    started = []
+
+    def _start():
+        process = multiprocessing.Process(target=_sleep, daemon=True)
+        process.start()
+        started.append(process)
+        return process
+
+    process = multiprocessing.Process(target=_exit, daemon=True)
+    process.start()
+    with caplog.at_level(logging.ERROR, logger="clickup_to_ical"):
+        supervisor = threading.Thread(target=server._supervise, args=(process, _start), daemon=True)
+        supervisor.start()
+        deadline = time.time() + 10
+        while len(started) <= 0 and time.time() < deadline:
+            time.sleep(0.05)
+    assert len(started) == 1 and started[0].is_alive()
+    assert f"Fetcher process {process.pid} exited with 0" in caplog.text
+    # Like on exit, the fetcher stopped while shutting down is not started again
+    stopping.set()
+    started[0].terminate()
+    supervisor.join(timeout=10)
+    assert not supervisor.is_alive() and len(started) == 1
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture()
+def snapshot(tenant, tmp_path, monkeypatch):
+    from clickup_to_ical.shared import SharedSnapshot
+    path = str(tmp_path / "shared.bin")
+    monkeypatch.setattr(tenant, "shared_snapshot_file", path)
+    tenant.save_tasks()
+    return SharedSnapshot(path)
+
+
+def _records(records):
+    return [(x.task.id, x.name, x.date) for x in records]
+
+
+def test_indexes(tenant, snapshot):
+    indexes = tenant.tasks.snapshot.data
+    assert snapshot.indexes.keys() == indexes.keys()
+    assert snapshot.task_count == len(indexes[None])
+    for key, index in indexes.items():
+        mapped = snapshot.indexes[key]
+        assert mapped == index and mapped.version == index.version
+        assert len(mapped) == len(index)
+        assert mapped.event_count() == index.event_count()
+        assert mapped.task_ids() == index.task_ids()
+        for include_closed in (True, False):
+            assert _records(mapped.records(None, include_closed)) == _records(index.records(None, include_closed))
+
+
+def test_date_types_and_time_window(tenant, snapshot):
+    index, mapped = tenant.tasks.snapshot.data[None], snapshot.indexes[None]
+    names = sorted({name for name, _ in index.groups().keys() if name is not None})
+    dates = sorted(x.date for x in index.records(None, True))
+    start, end = dates[len(dates) // 4], dates[3 * len(dates) // 4]
+    for date_types in (names[:1], names, ["unknown"]):
+        for window in ((None, None), (start, None), (None, end), (start, end), (end, start + timedelta(days=1))):
+            expected = _records(index.records(date_types, True, *window))
+            assert _records(mapped.records(date_types, True, *window)) == expected
+
+
+def test_tasks(tenant, snapshot):
+    from clickup_to_ical.index import render_version
+    tasks = {x.id: x for x in tenant.tasks.snapshot.data[None]}
+    assert sorted(snapshot.task_ids()) == sorted(tasks)
+    for record in snapshot.indexes[None].records(None, True):
+        # Decoded tasks render exactly like the ones they were written from, parents and members included
+        assert render_version(record.task) == render_version(tasks[record.task.id])
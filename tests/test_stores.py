@@ -0,0 +1,39 @@
+def test_update_tasks(tenant, fake_api):
+    calls = tenant.sync.client.stats()[0]
+    indexes = tenant._update_tasks()
+    # Without subtasks and closed tasks only open top level tasks are synced
+    expected = {x["id"] for x in fake_api.task_index.values() if x["parent"] is None and x["status"]["type"] != "closed"}
+    assert {x.id for x in indexes[None]} == expected
+    assert tenant.sync.client.stats()[0] > calls
+    assert tenant.tasks.generation > 0
+
+
+def test_reload_after_failed_load(tenant, tmp_path):
+    import os
+    path = str(tmp_path / "snapshot.json.gz")
+    with open(path, "wb") as f_out:
+        f_out.write(b"partially written")
+    stat = os.stat(path)
+    tenant.snapshot_file = path
+    try:
+        assert tenant._reload_tasks() is None
+        # A complete file with the same mtime as the broken one is still loaded
+        tenant.sync.save(path=path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        indexes = tenant._reload_tasks()
+        assert indexes is not None and len(indexes[None]) > 0
+        assert tenant._reload_tasks() is None
+    finally:
+        tenant.snapshot_file = None
+        tenant._snapshot_mtime = None
+
+
+def test_update_failures_per_tenant():
+    from clickup_to_ical.metrics import UPDATE_FAILURES
+    from clickup_to_ical.utils import SnapshotDict, _run_update
+
+    def _fail():
+        raise RuntimeError("Clickup is down")
+
+    _run_update(SnapshotDict(tenant="failing"), _fail)
+    assert dict((tuple(k), v) for k, v in UPDATE_FAILURES.state())[("_fail", "failing")] == 1
@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import os
+import sys
+
+import pytest
+
+from conftest import SUBTASK_TENANT, TENANT, WEBHOOK_SECRET
+
+_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "webhooks")
+
+
+def _post(body: bytes, secret: str = WEBHOOK_SECRET, tenant: str = TENANT):
+    from clickup_to_ical.web import app
+    signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return app.test_client().post(f"/api/1.0/webhook?tenant={tenant}", data=body,
+                                  headers={"X-Signature": signature, "Content-Type": "application/json"})
+
+
+def _replay(name: str, secret: str = WEBHOOK_SECRET):
+    # Recorded payloads are sent byte for byte, the signature covers the raw body like the one of Clickup
+    with open(os.path.join(_FIXTURES, f"{name}.json"), "rb") as f_in:
+        return _post(f_in.read(), secret=secret)
+
+
+def _open(fake_api, task_id: str) -> dict:
+    task = fake_api.task_index[task_id]
+    task["status"] = {"id": "st-to do", "status": "to do", "color": "#d3d3d3", "orderindex": 0, "type": "open"}
+    task["parent"] = None
+    return task
+
+
+def _task_ids(tenant) -> set:
+    return {x.id for x in tenant.tasks.get(None, ())}
+
+
+@pytest.fixture()
+def synced(tenant, fake_api):
+    for task_id in ("000000004", "000000008"):
+        _open(fake_api, task_id)
+    tenant.tasks.set(tenant._update_tasks())
+    return tenant
+
+
+def test_task_updated(synced, fake_api):
+    fake_api.task_index["000000004"]["name"] = "Renamed task"
+    assert _replay("taskUpdated").status_code == 200
+    task = next(x for x in synced.tasks.get(None) if x.id == "000000004")
+    assert task.name == "Renamed task"
+
+
+def test_task_created(synced, fake_api):
+    task = {**_open(fake_api, "000000000"), "id": "0000fffff", "name": "Created task"}
+    fake_api.task_index[task["id"]] = task
+    fake_api.tasks[task["list"]["id"]].append(task)
+    assert "0000fffff" not in _task_ids(synced)
+    assert _replay("taskCreated").status_code == 200
+    assert "0000fffff" in _task_ids(synced)
+
+
+def test_task_deleted(synced):
+    assert "000000008" in _task_ids(synced)
+    assert _replay("taskDeleted").status_code == 200
+    assert "000000008" not in _task_ids(synced)
+
+
+def test_other_events_are_ignored(synced):
+    generation = synced.tasks.generation
+    assert _replay("listCreated").status_code == 200
+    assert synced.tasks.generation == generation
+
+
+def test_invalid_signature(synced):
+    assert _replay("taskUpdated", secret="wrong").status_code == 401
+
+
+def test_parent_updated(subtask_tenant, fake_api):
+    import json
+    subtask_tenant.tasks.set(subtask_tenant._update_tasks())
+    everyone = subtask_tenant.tasks.get(None)
+    # A subtask none of whose assignees is assigned to its parent as well
+    task = next(x for x in everyone if x.parent is not None and len(x.assignees) > 0 and
+                not set(x.assignees) & set(x.parent.assignees))
+    parent = fake_api.task_index[task.parent.id]
+    assignee = task.assignees[0]
+    version = subtask_tenant.tasks.get(assignee).version
+    parent["name"] = "Renamed parent"
+    parent["date_updated"] = str(int(parent["date_updated"]) + 1)
+    body = json.dumps({"event": "taskUpdated", "task_id": parent["id"], "webhook_id": "test"}).encode("utf-8")
+    assert _post(body, tenant=SUBTASK_TENANT).status_code == 200
+    index = subtask_tenant.tasks.get(assignee)
+    assert next(x for x in index if x.id == task.id).get_name().startswith("Renamed parent")
+    assert index.version != version
+
+
+def test_concurrent_webhooks(synced, fake_api):
+    from concurrent.futures import ThreadPoolExecutor
+    # Every webhook changes the index of all tasks
+    task_ids = [x.id for x in synced.tasks.get(None)]
+    for task_id in task_ids:
+        fake_api.task_index[task_id]["name"] = f"Concurrent {task_id}"
+    # With some latency the requests of all webhooks return at the same time and their index changes overlap
+    fake_api.latency = 0.02
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=len(task_ids)) as pool:
+            list(pool.map(lambda x: synced.apply_webhook({"event": "taskUpdated", "task_id": x}), task_ids))
+    finally:
+        fake_api.latency = 0.0
+        sys.setswitchinterval(interval)
+    names = {x.id: x.name for x in synced.tasks.get(None)}
+    assert all(names[x] == f"Concurrent {x}" for x in task_ids)